@@ -0,0 +1,416 @@
+"""API HTTP local (JSON) sobre as funções de database.py, para scripts e e-readers.
+
+Só biblioteca padrão (http.server): cada requisição roda em uma thread própria, com a
+sua conexão SQLite (fechada ao final). Rotas:
+
+    GET    /books                 livros por título, paginação keyset (?status=, ?limit=, ?cursor=)
+    POST   /books                 cadastra um livro
+    GET    /books/<id>            um livro (com os contadores de leitura)
+    PUT    /books/<id>            altera um livro (campos omitidos ficam como estão)
+    DELETE /books/<id>            apaga o livro e os seus registros
+    GET    /logs                  histórico por paginação keyset (?limit=, ?cursor=,
+                                  ?book_id=, ?start_date=, ?end_date=)
+    POST   /logs                  um registro de leitura
+    POST   /logs/batch            vários registros ({"entries": [...]}) em uma transação
+    GET    /stats                 métricas do dashboard (?start_year=, ?end_year=)
+    GET    /stats/summary         páginas/registros/dias no período (?start_date=, ?end_date=)
+
+Datas em 'YYYY-MM-DD'. Toda resposta de GET leva um ETag derivado do data_version do
+banco (que muda a cada escrita); com If-None-Match igual a resposta é 304, sem corpo.
+A rota é resolvida antes (um livro inexistente continua dando 404), mas com os dados
+inalterados as leituras vêm do cache de database.py. Com TAZ_MULTI_TENANT=1 o leitor
+vem de ?leitor= ou do cabeçalho X-Leitor, como nas páginas.
+
+Uso: python api.py [--host 127.0.0.1] [--port 8765] [--db arquivo.db]
+"""
+import argparse
+import base64
+import binascii
+import json
+import re
+import sqlite3
+import zlib
+from datetime import date, datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import database as db
+import profiling
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_BATCH_ENTRIES = 10000
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+BOOK_FIELDS = ['title', 'author', 'genre', 'total_pages', 'status', 'start_date', 'end_date']
+
+class ApiError(Exception):
+    """Erro com status HTTP, devolvido como {"error": mensagem}."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# --- Conversões ---
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if hasattr(value, 'item'): # Escalares NumPy
+        return value.item()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+def _records(df):
+    """DataFrame -> lista de dicts, com datas em 'YYYY-MM-DD' e nulos como None."""
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype.kind == 'M':
+            df[column] = df[column].dt.strftime('%Y-%m-%d')
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+def _int_param(query, name, default=None, minimum=None, maximum=None):
+    value = query.get(name, default)
+    if value is None:
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"'{name}' deve ser um número inteiro")
+    if minimum is not None and value < minimum:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"'{name}' deve ser no mínimo {minimum}")
+    return min(value, maximum) if maximum is not None else value
+
+def _date_param(values, name):
+    value = values.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"'{name}' deve estar no formato YYYY-MM-DD")
+
+def _encode_cursor(cursor):
+    return None if cursor is None else f"{cursor[0]}:{cursor[1]}"
+
+def _decode_cursor(value):
+    if not value:
+        return None
+    match = re.fullmatch(r"(-?\d+):(\d+)", value)
+    if not match:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "'cursor' inválido: use o next_cursor da página anterior")
+    return int(match.group(1)), int(match.group(2))
+
+def _encode_book_cursor(cursor):
+    # (título, id): o título pode ter qualquer caractere, então vai como JSON em base64
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(cursor, ensure_ascii=False).encode('utf-8')).decode('ascii')
+
+def _decode_book_cursor(value):
+    if not value:
+        return None
+    try:
+        title, book_id = json.loads(base64.urlsafe_b64decode(value.encode('ascii')))
+        return str(title), int(book_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "'cursor' inválido: use o next_cursor da página anterior")
+
+def _require_object(body):
+    if not isinstance(body, dict):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "O corpo da requisição deve ser um objeto JSON")
+
+def _book_values(body, current=None):
+    """Campos do livro validados; os omitidos vêm de `current` (alteração parcial)."""
+    _require_object(body)
+    values = {field: body.get(field, (current or {}).get(field)) for field in BOOK_FIELDS}
+    missing = [field for field in ('title', 'author', 'total_pages', 'status') if values[field] in (None, '')]
+    if missing:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"Campos obrigatórios ausentes: {', '.join(missing)}")
+    if values['status'] not in db.BOOK_STATUSES:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"status inválido (válidos: {', '.join(db.BOOK_STATUSES)})")
+    values['total_pages'] = _int_param(values, 'total_pages', minimum=1)
+    for field in ('start_date', 'end_date'):
+        values[field] = _date_param(values, field)
+    return values
+
+def _log_values(body):
+    _require_object(body)
+    for field in ('book_id', 'log_date', 'pages_read'):
+        if body.get(field) in (None, ''):
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Campo obrigatório ausente: {field}")
+    return (_int_param(body, 'book_id'), _date_param(body, 'log_date'),
+            _int_param(body, 'pages_read', minimum=1), body.get('notes'))
+
+def _existing_book(book_id):
+    book = db.get_book_by_id(int(book_id))
+    if book is None:
+        raise ApiError(HTTPStatus.NOT_FOUND, f"Livro {book_id} não encontrado")
+    return book
+
+# --- Rotas ---
+# Cada rota recebe (query, body, *grupos da URL) e retorna (status, payload) ou só o payload
+
+def list_books(query, body):
+    status = query.get('status') or None
+    if status is not None and status not in db.BOOK_STATUSES:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"status inválido (válidos: {', '.join(db.BOOK_STATUSES)})")
+    limit = _int_param(query, 'limit', DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+    books, total, next_cursor = db.get_books_page(limit, after=_decode_book_cursor(query.get('cursor')), status=status)
+    return {'items': books, 'total': total, 'next_cursor': _encode_book_cursor(next_cursor)}
+
+def create_book(query, body):
+    book_id = db.add_book(**_book_values(body))
+    return HTTPStatus.CREATED, db.get_book_by_id(book_id)
+
+def get_book(query, body, book_id):
+    return _existing_book(book_id)
+
+def update_book(query, body, book_id):
+    db.update_book(int(book_id), **_book_values(body, current=_existing_book(book_id)))
+    return db.get_book_by_id(int(book_id))
+
+def delete_book(query, body, book_id):
+    _existing_book(book_id)
+    db.delete_book(int(book_id))
+    return HTTPStatus.NO_CONTENT, None
+
+def list_logs(query, body):
+    limit = _int_param(query, 'limit', DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+    logs, total, next_cursor = db.get_reading_log_page_records(
+        limit, after=_decode_cursor(query.get('cursor')), book_id=_int_param(query, 'book_id'),
+        start_date=_date_param(query, 'start_date'), end_date=_date_param(query, 'end_date'))
+    return {'items': logs, 'total': total, 'next_cursor': _encode_cursor(next_cursor)}
+
+def create_log(query, body):
+    book_id, log_date, pages_read, notes = _log_values(body)
+    _existing_book(book_id)
+    # Pela fila de escrita quando TAZ_WRITE_BEHIND=1; responde só com o registro gravado
+    log_id = db.submit_log_entry(book_id, log_date, pages_read, notes).result()
+    return HTTPStatus.CREATED, {'id': log_id, 'book_id': book_id, 'log_date': log_date,
+                                'pages_read': pages_read, 'notes': notes}
+
+def create_logs_batch(query, body):
+    entries = body.get('entries') if isinstance(body, dict) else body
+    if not isinstance(entries, list) or not entries:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Envie {\"entries\": [...]} com ao menos um registro")
+    if len(entries) > MAX_BATCH_ENTRIES:
+        raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"No máximo {MAX_BATCH_ENTRIES} registros por lote")
+    if not all(isinstance(entry, dict) for entry in entries):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Cada registro deve ser um objeto JSON")
+    import pandas as pd # Só nos lotes: a importação em lote trabalha com DataFrames
+    df = pd.DataFrame(entries)
+    missing = {'log_date', 'pages_read'} - set(df.columns)
+    if missing:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"Campos obrigatórios ausentes: {', '.join(sorted(missing))}")
+    if not {'book_id', 'title', 'book_title'} & set(df.columns):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Informe book_id ou title para identificar os livros")
+    result = db.bulk_add_log_entries(df, row_offset=0)
+    # Cada erro aponta a posição em `entries` (a partir de 0) e o identificador enviado nela
+    errors = []
+    for position, message in zip(result['errors']['row'].tolist(), result['errors']['error'].tolist()):
+        sent = entries[position]
+        identifiers = {key: sent[key] for key in ('book_id', 'title', 'book_title', 'author') if key in sent}
+        errors.append({'entry': position, **identifiers, 'error': message})
+    return {'imported': result['imported'], 'errors': errors}
+
+def get_stats(query, body):
+    import stats # pandas + logstore: só quem pede as métricas paga o import
+    start_year = _int_param(query, 'start_year', minimum=1)
+    end_year = _int_param(query, 'end_year', minimum=1)
+    # Sem start_year o intervalo começa no ano atual (como em compute_stats)
+    if end_year is not None and (start_year or date.today().year) > end_year:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "'start_year' deve ser menor ou igual a 'end_year'")
+    result = stats.compute_stats(start_year, end_year)
+    return {
+        'per_year': _records(result['per_year'].reset_index()),
+        'totals': result['totals'],
+        'pages_per_month': _records(result['pages_per_month']),
+        'pages_per_weekday': _records(result['pages_per_weekday']),
+        'genres': result['genres'].to_dict(),
+        'books_by_status': result['books_by_status'],
+    }
+
+def get_summary(query, body):
+    return db.get_reading_summary(_date_param(query, 'start_date'), _date_param(query, 'end_date'))
+
+ROUTES = [
+    ('GET', r'/books', list_books),
+    ('POST', r'/books', create_book),
+    ('GET', r'/books/(\d+)', get_book),
+    ('PUT', r'/books/(\d+)', update_book),
+    ('DELETE', r'/books/(\d+)', delete_book),
+    ('GET', r'/logs', list_logs),
+    ('POST', r'/logs', create_log),
+    ('POST', r'/logs/batch', create_logs_batch),
+    ('GET', r'/stats', get_stats),
+    ('GET', r'/stats/summary', get_summary),
+]
+_ROUTES = [(method, re.compile(pattern + '/?'), pattern, handler) for method, pattern, handler in ROUTES]
+
+# Respostas que dependem da data atual (ano padrão), além dos dados
+_DATED_ROUTES = {get_stats}
+
+# --- Servidor ---
+
+def etag_for(handler):
+    """ETag da resposta de um GET: banco, versão dos dados e, se a rota depende dela, a data."""
+    tag = f"{zlib.crc32(db.get_db_name().encode()):08x}-{db.get_data_version()}"
+    if handler in _DATED_ROUTES:
+        tag += f"-{date.today().isoformat()}"
+    return f'"{tag}"'
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return '*' in tags or etag in tags
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = 'ControleLeituraTaz'
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def do_PUT(self):
+        self._dispatch()
+
+    def do_DELETE(self):
+        self._dispatch()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _dispatch(self):
+        url = urlsplit(self.path)
+        # Há um corpo a ler (até _read_body consumi-lo)
+        self._body_pending = self.command != 'GET' and self.headers.get('Content-Length', '0').strip() != '0'
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            self._select_database(query)
+            method_matched = False
+            for method, pattern, name, handler in _ROUTES:
+                match = pattern.fullmatch(url.path)
+                if not match:
+                    continue
+                method_matched = True
+                if method == self.command:
+                    profiling.begin_run(f"API {method} {name}")
+                    return self._respond(handler, query, match.groups())
+            if method_matched:
+                raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, f"Método {self.command} não permitido em {url.path}")
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Rota não encontrada: {url.path}")
+        except ApiError as e:
+            self._send_error(e.status, str(e))
+        except sqlite3.IntegrityError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, f"Dados inválidos: {e}")
+        except Exception as e:
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"Erro interno: {e}")
+        finally:
+            db.close_db()
+
+    def _select_database(self, query):
+        if self.server.db_path is None and db.TENANT_MODE:
+            tenant_id = query.get('leitor') or self.headers.get('X-Leitor')
+            if not tenant_id:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "Informe o leitor em ?leitor= ou no cabeçalho X-Leitor")
+            try:
+                db.set_tenant(tenant_id)
+            except ValueError as e:
+                raise ApiError(HTTPStatus.BAD_REQUEST, str(e))
+        else:
+            db.set_db_path(self.server.db_path)
+
+    def _read_body(self):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Content-Length inválido")
+        if length > MAX_BODY_BYTES:
+            raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Corpo maior que {MAX_BODY_BYTES} bytes")
+        content = self.rfile.read(length)
+        self._body_pending = False
+        if not content:
+            return {}
+        try:
+            return json.loads(content)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Corpo da requisição não é um JSON válido")
+
+    def _respond(self, handler, query, groups):
+        headers = {}
+        if self.command == 'GET':
+            # A versão é lida antes da consulta: uma escrita no meio só deixa o ETag mais antigo
+            headers['ETag'] = etag_for(handler)
+            body = {}
+        else:
+            body = self._read_body()
+        # A rota roda mesmo com o ETag igual: recurso inexistente e parâmetros inválidos
+        # continuam dando 404/400 (e as leituras repetidas saem do cache por versão)
+        result = handler(query, body, *groups)
+        status, payload = result if isinstance(result, tuple) else (HTTPStatus.OK, result)
+        profiling.checkpoint("resposta")
+        if status == HTTPStatus.OK and 'ETag' in headers and _etag_matches(self.headers.get('If-None-Match'), headers['ETag']):
+            return self._send_json(HTTPStatus.NOT_MODIFIED, None, headers)
+        self._send_json(status, payload, headers)
+
+    def _send_error(self, status, message):
+        if self._body_pending:
+            # O corpo não foi lido: a conexão não pode ser reaproveitada
+            self.close_connection = True
+        self._send_json(status, {'error': message})
+
+    def _send_json(self, status, payload, headers=None):
+        content = b'' if payload is None else json.dumps(payload, default=_json_default, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if db.TENANT_MODE:
+            self.send_header('Vary', 'X-Leitor')
+        if status not in (HTTPStatus.NO_CONTENT, HTTPStatus.NOT_MODIFIED):
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if status not in (HTTPStatus.NO_CONTENT, HTTPStatus.NOT_MODIFIED):
+            self.wfile.write(content)
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128 # Lotes de clientes em paralelo (o padrão do socketserver é 5)
+
+    def __init__(self, address, db_path=None, verbose=True):
+        self.db_path = db_path
+        self.verbose = verbose
+        super().__init__(address, ApiHandler)
+
+def make_server(db_path=None, host=DEFAULT_HOST, port=DEFAULT_PORT, verbose=True):
+    """Servidor da API sobre `db_path` (padrão: DB_NAME ou os shards); port=0 escolhe uma porta livre.
+
+    Não começa a atender: chame serve_forever() (ex.: em uma thread) e shutdown() ao final.
+    """
+    return ApiServer((host, port), db_path=db_path, verbose=verbose)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--db', help="Arquivo do banco (padrão: TAZ_READING_DB ou taz_reading.db)")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.db, args.host, args.port)
+    print(f"API em http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+"""Gerador de dados sintéticos e benchmarks de database.py e das estatísticas.
+
+Cria um banco temporário na escala pedida, mede as funções de leitura/escrita e a
+importação e grava os resultados em JSON, para comparar versões:
+
+    python benchmark.py --books 100000 --logs 10000000 --output atual.json
+    python benchmark.py --books 100000 --logs 10000000 --baseline atual.json
+
+Também mede o tempo de import de cada página (app.py e pages/) em um interpretador
+novo, como no primeiro acesso após um deploy; para medir só isso:
+
+    python benchmark.py --startup-only --output inicio.json
+
+O banco usado é definido por TAZ_READING_DB antes de importar database.py, então o
+taz_reading.db do usuário nunca é tocado.
+"""
+import argparse
+import ast
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+# Proporção de livros por status (biblioteca típica: muitos desejados e concluídos)
+STATUS_MIX = {'desejado': 0.30, 'lendo': 0.05, 'concluído': 0.55, 'abandonado': 0.10}
+
+GENRES = ['Romance', 'Ficção Científica', 'Fantasia', 'Biografia', 'História', 'Filosofia',
+          'Suspense', 'Poesia', 'Autoajuda', 'Tecnologia', '']
+
+NOTE_WORDS = ['capítulo', 'personagem', 'final', 'trama', 'ideia', 'autor', 'história', 'narrador',
+              'reviravolta', 'começo', 'lento', 'ótimo', 'releitura', 'citação', 'conceito']
+
+LOG_BATCH_ROWS = 1_000_000
+
+# --- Gerador de Dados ---
+
+def generate_books(n_books, years, rng):
+    """DataFrame de livros no formato de importação (bulk_add_books)."""
+    today = np.datetime64(date.today(), 'D')
+    status = rng.choice(list(STATUS_MIX), size=n_books, p=list(STATUS_MIX.values()))
+    total_pages = rng.integers(80, 900, size=n_books)
+    # Autores com popularidade desigual (poucos autores com muitos livros)
+    n_authors = max(n_books // 8, 1)
+    author = np.minimum(rng.zipf(1.5, size=n_books), n_authors)
+
+    start = today - rng.integers(0, years * 365, size=n_books).astype('timedelta64[D]')
+    duration = np.maximum(total_pages // rng.integers(10, 60, size=n_books), 1).astype('timedelta64[D]')
+    end = np.minimum(start + duration, today)
+
+    has_start = status != 'desejado'
+    has_end = np.isin(status, ['concluído', 'abandonado'])
+    return pd.DataFrame({
+        'title': [f"Livro {i}" for i in range(n_books)],
+        'author': [f"Autor {a}" for a in author],
+        'genre': rng.choice(GENRES, size=n_books),
+        'total_pages': total_pages,
+        'status': status,
+        'start_date': pd.Series(start.astype(str)).where(has_start),
+        'end_date': pd.Series(end.astype(str)).where(has_end),
+    })
+
+def generate_logs(books, n_logs, rng, note_ratio=0.15):
+    """Gera DataFrames de registros de leitura em lotes de LOG_BATCH_ROWS linhas.
+
+    Só livros iniciados recebem registros; a quantidade por livro segue uma distribuição
+    de cauda longa e as datas ficam entre o início e o fim (ou hoje) de cada livro.
+    """
+    today = np.datetime64(date.today(), 'D')
+    books = books[books['start_date'].notna()]
+    book_ids = books['id'].to_numpy()
+    starts = pd.to_datetime(books['start_date']).to_numpy().astype('datetime64[D]')
+    ends = pd.to_datetime(books['end_date']).fillna(pd.Timestamp(today)).to_numpy().astype('datetime64[D]')
+    spans = (ends - starts).astype('int64') + 1
+    weights = rng.pareto(1.2, size=len(book_ids)) + 1
+    weights /= weights.sum()
+
+    for offset in range(0, n_logs, LOG_BATCH_ROWS):
+        size = min(LOG_BATCH_ROWS, n_logs - offset)
+        pick = rng.choice(len(book_ids), size=size, p=weights)
+        log_dates = starts[pick] + (rng.random(size) * spans[pick]).astype('int64').astype('timedelta64[D]')
+        notes = np.full(size, None, dtype=object)
+        with_note = rng.random(size) < note_ratio
+        notes[with_note] = [" ".join(words) for words in rng.choice(NOTE_WORDS, (with_note.sum(), 5))]
+        yield pd.DataFrame({
+            'book_id': book_ids[pick],
+            'log_date': log_dates.astype(str),
+            'pages_read': rng.integers(1, 60, size=size),
+            'notes': notes,
+        })
+
+def populate(db, n_books, n_logs, years, seed):
+    """Preenche o banco atual pelos caminhos de importação e mede cada etapa."""
+    rng = np.random.default_rng(seed)
+    timings = {}
+
+    books = generate_books(n_books, years, rng)
+    buffer = io.BytesIO(books.to_csv(index=False).encode('utf-8'))
+    started = time.perf_counter()
+    for _ in db.iter_import_books_csv(buffer, sep=','):
+        pass
+    timings['import_books_csv'] = time.perf_counter() - started
+
+    books = db.get_all_books.uncached()
+    started = time.perf_counter()
+    for batch in generate_logs(books, n_logs, rng):
+        db.bulk_add_log_entries(batch)
+    timings['import_logs'] = time.perf_counter() - started
+    return timings
+
+# --- Benchmarks ---
+
+def measure(func, repeat):
+    """Executa func `repeat` vezes e retorna os tempos (s)."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return times
+
+def summarize(name, times):
+    return {
+        'name': name,
+        'runs': len(times),
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'max': max(times),
+    }
+
+def run_benchmarks(db, stats, repeat, seed):
+    """Mede as funções de leitura sem cache (.uncached), o acerto de cache e as escritas."""
+    rng = np.random.default_rng(seed + 1)
+    book_ids = db.get_all_books.uncached()['id'].to_numpy()
+    bounds = db.get_reading_date_bounds.uncached()
+    last_date = bounds[1] if bounds else date.today()
+    month_start = last_date.replace(day=1)
+    now = datetime.now()
+    current_year, current_month = now.year, now.month
+
+    def some_book():
+        return int(rng.choice(book_ids))
+
+    db.get_all_books() # Aquece o cache para medir só o acerto em get_all_books[cached]
+
+    cases = [
+        ('get_all_books', lambda: db.get_all_books.uncached()),
+        ('get_all_books[cached]', lambda: db.get_all_books()),
+        ('get_reading_log', lambda: db.get_reading_log.uncached()),
+        ('get_reading_log[book_id]', lambda: db.get_reading_log.uncached(book_id=some_book())),
+        ('get_reading_log[month]', lambda: db.get_reading_log.uncached(start_date=month_start, end_date=last_date)),
+        ('get_reading_log_page[first]', lambda: db.get_reading_log_page.uncached(50)),
+        ('get_pages_read_for_book', lambda: db.get_pages_read_for_book.uncached(some_book())),
+        ('get_progress_for_books[lendo]', lambda: db.get_progress_for_books.uncached(status='lendo')),
+        ('stats.compute_stats[year]', lambda: stats._compute_stats.uncached(current_year, current_year, current_year, current_month)),
+        ('stats.compute_stats[5 years]', lambda: stats._compute_stats.uncached(current_year - 4, current_year, current_year, current_month)),
+        ('search_notes', lambda: db.search_notes.uncached('personagem fin', 20)),
+        # Escritas por último: cada uma incrementa a versão dos dados
+        ('add_log_entry', lambda: db.add_log_entry(some_book(), last_date, 10, 'benchmark')),
+    ]
+    return [summarize(name, measure(func, repeat)) for name, func in cases]
+
+# --- Tempo de Inicialização ---
+# Cada página é medida em um interpretador novo, como no primeiro acesso após um deploy:
+# os imports de nível superior do script são lidos com ast e importados com -X importtime.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# __import__ passa pelo import em C, o único medido pelo -X importtime (importlib.import_module não)
+_IMPORT_SCRIPT = """
+import sys
+for name in sys.argv[1:]:
+    try:
+        __import__(name)
+    except ImportError:
+        print(name) # Módulo ausente neste ambiente
+"""
+
+def page_scripts():
+    """app.py e as páginas, na ordem do menu."""
+    pages = sorted(f for f in os.listdir(os.path.join(APP_DIR, 'pages')) if f.endswith('.py'))
+    return ['app.py'] + [os.path.join('pages', f) for f in pages]
+
+def page_imports(script):
+    """Módulos importados no nível superior de um script, na ordem."""
+    with open(os.path.join(APP_DIR, script), encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return modules
+
+def measure_imports(modules):
+    """Importa `modules` em um interpretador novo; retorna ({módulo: s}, ausentes).
+
+    O tempo de cada módulo é o acumulado do -X importtime, ou seja, inclui as
+    dependências que ele carregou primeiro (um módulo já carregado por outro custa 0).
+    """
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', _IMPORT_SCRIPT, *modules],
+                               cwd=APP_DIR, capture_output=True, text=True, check=True)
+    times = dict.fromkeys(modules, 0.0)
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line.split('|')
+        # Só os imports de nível superior (os aninhados vêm indentados)
+        if not name.startswith('  ') and name.strip() in times:
+            times[name.strip()] = int(cumulative) / 1e6
+    return times, completed.stdout.split()
+
+def run_startup_benchmarks(repeat):
+    """Tempo de import de cada página (app.py e pages/) em `repeat` interpretadores novos.
+
+    Retorna (results, breakdown): um resultado 'startup[página]' por página e, por
+    página, a mediana por módulo e os módulos ausentes no ambiente.
+    """
+    results, breakdown = [], {}
+    for script in page_scripts():
+        modules = page_imports(script)
+        runs = [measure_imports(modules) for _ in range(repeat)]
+        results.append(summarize(f"startup[{os.path.basename(script)}]", [sum(times.values()) for times, _ in runs]))
+        breakdown[script] = {
+            'modules': {name: statistics.median(times[name] for times, _ in runs) for name in modules},
+            'missing': runs[0][1],
+        }
+    return results, breakdown
+
+def print_startup(breakdown):
+    for script, info in breakdown.items():
+        modules = sorted(info['modules'].items(), key=lambda item: item[1], reverse=True)
+        print(f"{script}: {sum(info['modules'].values()) * 1000:.0f} ms")
+        for name, seconds in modules[:5]:
+            print(f"    {name:28} {seconds * 1000:8.1f} ms")
+        if info['missing']:
+            print(f"    ausentes (não medidos): {', '.join(info['missing'])}")
+
+def compare(results, baseline, threshold):
+    """Compara medianas com um resultado anterior; retorna os nomes que ficaram mais lentos."""
+    previous = {r['name']: r for r in baseline['results']}
+    regressions = []
+    print(f"{'benchmark':34} {'antes (ms)':>12} {'agora (ms)':>12} {'razão':>8}")
+    for result in results:
+        before = previous.get(result['name'])
+        if before is None:
+            continue
+        ratio = result['median'] / before['median'] if before['median'] > 0 else float('inf')
+        flag = "  <-- regressão" if ratio > threshold else ""
+        print(f"{result['name']:34} {before['median'] * 1000:12.2f} {result['median'] * 1000:12.2f} {ratio:8.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(result['name'])
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--books', type=int, default=10_000)
+    parser.add_argument('--logs', type=int, default=200_000)
+    parser.add_argument('--years', type=int, default=10, help="Período coberto pelos dados (anos até hoje)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--db', help="Arquivo do banco (padrão: arquivo temporário, apagado ao final)")
+    parser.add_argument('--output', help="Arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument('--baseline', help="JSON de uma execução anterior para comparar")
+    parser.add_argument('--threshold', type=float, default=1.25, help="Razão de mediana considerada regressão")
+    parser.add_argument('--startup-only', action='store_true',
+                        help="Mede só o tempo de import das páginas (sem gerar dados)")
+    args = parser.parse_args(argv)
+
+    tmp_dir = None
+    if args.db is None:
+        tmp_dir = tempfile.TemporaryDirectory(prefix='taz_bench_')
+        args.db = os.path.join(tmp_dir.name, 'taz_reading.db')
+    # Precisa estar definido antes de importar database (que cria o esquema na importação)
+    os.environ['TAZ_READING_DB'] = args.db
+    import database as db
+    import stats
+
+    try:
+        results = []
+        if not args.startup_only:
+            # A carga inicial já mede o caminho de importação (uma execução de cada)
+            setup = populate(db, args.books, args.logs, args.years, args.seed)
+            results += [summarize(name, [seconds]) for name, seconds in setup.items()]
+            results += run_benchmarks(db, stats, args.repeat, args.seed)
+        # Os interpretadores novos herdam TAZ_READING_DB: o banco já existe e está migrado
+        startup_results, startup = run_startup_benchmarks(args.repeat)
+        results += startup_results
+        report = {
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'pandas': pd.__version__,
+                'platform': platform.platform(),
+                'books': args.books,
+                'logs': args.logs,
+                'years': args.years,
+                'seed': args.seed,
+                'db_size_bytes': os.path.getsize(args.db),
+            },
+            'results': results,
+            'startup': startup,
+        }
+    finally:
+        db.close_db()
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(payload)
+    elif not args.baseline:
+        print(payload)
+    if args.output or args.baseline:
+        print_startup(startup)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if any(baseline['meta'].get(key) != report['meta'][key] for key in ('books', 'logs', 'years', 'seed')):
+            print("Aviso: a execução de referência usou outra escala/semente; as razões não são comparáveis.")
+        regressions = compare(results, baseline, args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
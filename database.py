@@ -1,22 +1,433 @@
+import atexit
+import csv
+import functools
+import importlib
+import io
+import json
+import os
+import queue
+import re
 import sqlite3
-import pandas as pd
-from datetime import datetime
+import sys
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, wait
+from datetime import date, datetime
+from pathlib import Path
+import profiling
 
-DB_NAME = "taz_reading.db"
+class _LazyModule:
+    """Módulo importado só no primeiro acesso a um atributo (ex.: pd.DataFrame)."""
 
-def connect_db():
-    """Cria uma conexão com o banco de dados SQLite."""
-    conn = sqlite3.connect(DB_NAME)
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
+
+# pandas e numpy levam centenas de ms para importar: ficam para a primeira função que
+# monta um DataFrame/array. Importar este módulo, as escritas e as leituras escalares
+# (get_book_by_id, contagens, resumos) não dependem deles.
+np = _LazyModule('numpy')
+pd = _LazyModule('pandas')
+
+# Caminho do banco; TAZ_READING_DB permite apontar para outro arquivo (ex.: benchmarks, testes)
+DB_NAME = os.environ.get("TAZ_READING_DB", "taz_reading.db")
+
+# PRAGMAs aplicados a cada conexão no momento em que ela é aberta.
+# Podem ser ajustados (ex.: db.PRAGMAS['busy_timeout'] = 10000) antes do primeiro acesso.
+PRAGMAS = {
+    'journal_mode': 'WAL',       # Leitores não bloqueiam o escritor (e vice-versa)
+    'synchronous': 'NORMAL',     # Seguro com WAL e bem mais barato que FULL
+    'busy_timeout': 5000,        # ms esperando o lock antes de "database is locked"
+    'cache_size': -20000,        # Negativo = KiB (~20 MB de cache de páginas)
+    'mmap_size': 268435456,      # 256 MB de leitura via mmap
+    'foreign_keys': 'ON',        # Necessário para o ON DELETE CASCADE do reading_log
+}
+
+# Uma conexão por thread (o Streamlit executa cada sessão em sua própria thread)
+_local = threading.local()
+
+class _ProfiledCursor(sqlite3.Cursor):
+    """Cursor que, com o profiling ligado, registra SQL, tempo e linhas de cada consulta.
+
+    O tempo inclui a leitura das linhas (fetchone/fetchmany/fetchall), já que no SQLite
+    boa parte do trabalho de um SELECT acontece durante a leitura.
+    """
+    _record = None
+
+    def execute(self, sql, parameters=()):
+        if not profiling.is_enabled():
+            self._record = None
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._record = profiling.record_query(sql, parameters, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        if not profiling.is_enabled():
+            self._record = None
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            # Os parâmetros de um lote não são guardados (podem ser milhares de linhas)
+            self._record = profiling.record_query(sql, None, time.perf_counter() - started, max(self.rowcount, 0))
+
+    def _fetch(self, fetch, *args):
+        if self._record is None:
+            return fetch(*args)
+        started = time.perf_counter()
+        result = fetch(*args)
+        self._record['seconds'] += time.perf_counter() - started
+        self._record['rows'] += len(result) if isinstance(result, list) else int(result is not None)
+        return result
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetch(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+class _ProfiledConnection(sqlite3.Connection):
+    """Conexão cujos cursores (inclusive os de conn.execute e do pandas) são _ProfiledCursor."""
+
+    def cursor(self, factory=_ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def _open_connection(db_name):
+    """Abre uma nova conexão e aplica os PRAGMAs configurados."""
+    conn = sqlite3.connect(db_name, timeout=PRAGMAS.get('busy_timeout', 5000) / 1000,
+                           factory=_ProfiledConnection)
     conn.row_factory = sqlite3.Row # Retorna linhas como dicionários
+    for pragma, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
     return conn
 
-def create_tables():
-    """Cria as tabelas necessárias se não existirem."""
-    conn = connect_db()
-    cursor = conn.cursor()
+_migrated_dbs = set()
+
+def get_db_name():
+    """Arquivo do banco usado pela thread atual: o shard do leitor definido ou DB_NAME."""
+    return getattr(_local, 'db_name', None) or DB_NAME
 
+def connect_db():
+    """Retorna a conexão SQLite da thread atual, abrindo-a no primeiro uso.
+
+    A conexão é reutilizada entre chamadas; não deve ser fechada por quem a usa.
+    """
+    db_name = get_db_name()
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_name)
+    if conn is None:
+        conn = connections[db_name] = _open_connection(db_name)
+        # Cada arquivo é migrado na primeira conexão do processo (shards abrem sob demanda)
+        if db_name not in _migrated_dbs:
+            _migrate(conn)
+            _migrated_dbs.add(db_name)
+    return conn
+
+def close_db():
+    """Fecha as conexões abertas pela thread atual (ex.: ao encerrar um worker)."""
+    connections = getattr(_local, 'connections', None) or {}
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+
+def set_db_path(path):
+    """Direciona a thread atual para outro arquivo de banco (None volta para DB_NAME)."""
+    _local.tenant_id, _local.db_name = None, path
+
+# --- Leitores (multi-tenant) ---
+# Com TAZ_MULTI_TENANT=1 cada leitor tem seu próprio arquivo (shard) em SHARD_DIR, com
+# seu próprio lock de escrita. O registro (registry.db) liga cada leitor ao seu arquivo;
+# set_tenant() direciona as funções deste módulo na thread atual para o shard do leitor,
+# que só é aberto (e migrado) no primeiro acesso.
+
+TENANT_MODE = os.environ.get("TAZ_MULTI_TENANT") == "1"
+SHARD_DIR = os.environ.get("TAZ_SHARD_DIR", "shards")
+MAX_ATTACHED_SHARDS = 10 # Limite padrão de bancos anexados por conexão (SQLITE_MAX_ATTACHED)
+
+_TENANT_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+def _registry_connection():
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(SHARD_DIR, 'registry.db'), timeout=PRAGMAS.get('busy_timeout', 5000) / 1000)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tenants (
+            tenant_id TEXT PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+    ''')
+    return conn
+
+def normalize_tenant_id(tenant_id):
+    """Identificador do leitor em minúsculas; ValueError se tiver caracteres inválidos."""
+    normalized = str(tenant_id).strip().lower()
+    if not _TENANT_ID_PATTERN.match(normalized):
+        raise ValueError("Identificador de leitor inválido: use até 64 letras, números, '_' ou '-'")
+    return normalized
+
+def register_tenant(tenant_id):
+    """Registra o leitor (se ainda não existir) e retorna o caminho do seu shard."""
+    tenant_id = normalize_tenant_id(tenant_id)
+    conn = _registry_connection()
+    try:
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO tenants (tenant_id, path) VALUES (?, ?)",
+                         (tenant_id, os.path.join(SHARD_DIR, f"{tenant_id}.db")))
+        return conn.execute("SELECT path FROM tenants WHERE tenant_id = ?", (tenant_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+def list_tenants():
+    """Leitores registrados: tenant_id, path e created_at."""
+    conn = _registry_connection()
+    try:
+        return pd.read_sql_query("SELECT tenant_id, path, created_at FROM tenants ORDER BY tenant_id", conn)
+    finally:
+        conn.close()
+
+_tenant_paths = {} # Leitor -> shard já resolvido, para não consultar o registro a cada rerun
+
+def set_tenant(tenant_id):
+    """Direciona a thread atual para o shard do leitor (None volta para DB_NAME)."""
+    if not tenant_id:
+        _local.tenant_id = _local.db_name = None
+        return
+    tenant_id = normalize_tenant_id(tenant_id)
+    if tenant_id not in _tenant_paths:
+        _tenant_paths[tenant_id] = register_tenant(tenant_id)
+    _local.tenant_id, _local.db_name = tenant_id, _tenant_paths[tenant_id]
+
+def get_tenant():
+    return getattr(_local, 'tenant_id', None)
+
+@contextmanager
+def use_tenant(tenant_id):
+    """Executa o bloco com a thread direcionada para o shard do leitor."""
+    # Restaura o destino completo (leitor e arquivo), inclusive um definido por set_db_path
+    previous = (getattr(_local, 'tenant_id', None), getattr(_local, 'db_name', None))
+    set_tenant(tenant_id)
+    try:
+        yield
+    finally:
+        _local.tenant_id, _local.db_name = previous
+
+# Uma linha por shard anexado (alias {shard}); parâmetros: tenant_id, início, fim, início, fim
+_GROUP_SUMMARY_SQL = """
+    SELECT ? AS tenant_id,
+           (SELECT COUNT(*) FROM {shard}.books
+            WHERE status = 'concluído' AND end_date BETWEEN ? AND ?) AS books_finished,
+           COALESCE(SUM(pages_read), 0) AS pages_read,
+           COALESCE(SUM(log_count), 0) AS log_count,
+           COUNT(*) AS reading_days
+    FROM {shard}.reading_daily
+    WHERE log_date BETWEEN ? AND ?
+"""
+
+def get_group_summary(start_date, end_date, tenants=None):
+    """Totais de leitura por leitor no período, lidos de todos os shards via ATTACH.
+
+    Os shards são anexados (somente leitura) a uma conexão em memória em grupos de até
+    MAX_ATTACHED_SHARDS, com uma consulta UNION ALL por grupo. Retorna tenant_id,
+    books_finished, pages_read, log_count e reading_days.
+    """
+    if tenants is None:
+        tenants = list_tenants()['tenant_id'].tolist()
+    dates = (to_day_number(start_date), to_day_number(end_date))
+    frames = []
+    conn = sqlite3.connect(":memory:", uri=True)
+    try:
+        for start in range(0, len(tenants), MAX_ATTACHED_SHARDS):
+            batch = [normalize_tenant_id(t) for t in tenants[start:start + MAX_ATTACHED_SHARDS]]
+            aliases = []
+            try:
+                for i, tenant_id in enumerate(batch):
+                    with use_tenant(tenant_id):
+                        connect_db() # Cria/migra o shard se ainda não foi aberto
+                        uri = Path(get_db_name()).absolute().as_uri() + "?mode=ro"
+                    conn.execute(f"ATTACH DATABASE ? AS shard{i}", (uri,))
+                    aliases.append(f"shard{i}")
+                query = " UNION ALL ".join(_GROUP_SUMMARY_SQL.format(shard=alias) for alias in aliases)
+                params = [p for tenant_id in batch for p in (tenant_id, *dates, *dates)]
+                frames.append(pd.read_sql_query(query, conn, params=params))
+            finally:
+                for alias in aliases:
+                    conn.execute(f"DETACH DATABASE {alias}")
+    finally:
+        conn.close()
+    if not frames:
+        return pd.DataFrame(columns=['tenant_id', 'books_finished', 'pages_read', 'log_count', 'reading_days'])
+    return pd.concat(frames, ignore_index=True)
+
+# --- Cache das Funções de Leitura ---
+# Os resultados são guardados por (função, banco, versão dos dados, argumentos). Toda
+# função de escrita incrementa data_version na mesma transação, então uma escrita de
+# qualquer sessão (ou processo) invalida o cache de todas na próxima leitura; as entradas
+# de versões anteriores do banco são descartadas assim que uma versão nova é vista.
+
+CACHE_MAX_ENTRIES = 256
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_versions = {} # Banco -> maior data_version já vista pelo cache
+
+def _bump_data_version(conn):
+    """Incrementa a versão dos dados (chamar dentro da transação de escrita)."""
+    conn.execute("UPDATE data_version SET version = version + 1 WHERE id = 1")
+
+def get_data_version():
+    row = connect_db().execute("SELECT version FROM data_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+def _freeze(value):
+    """Converte argumentos em algo hasheável para compor a chave do cache."""
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if hasattr(value, 'tolist'):
+        # ndarray, Series, Index e escalares NumPy: valores Python, comparáveis e hasheáveis
+        items = value.tolist()
+        return tuple(_freeze(v) for v in items) if isinstance(items, list) else items
+    return value
+
+def _evict_stale(db_name, version):
+    """Descarta as entradas de versões anteriores do banco (chamar com _cache_lock).
+
+    Retorna False se `version` já é antiga (o resultado não deve ser guardado).
+    """
+    latest = _cache_versions.get(db_name)
+    if latest is not None and version < latest:
+        return False
+    if latest is None or version > latest:
+        _cache_versions[db_name] = version
+        for key in [key for key in _cache if key[2] == db_name and key[3] < version]:
+            del _cache[key]
+    return True
+
+def _copy_result(value):
+    # Cópias garantem que quem recebe o resultado pode alterá-lo sem afetar o cache
+    # (sem o pandas carregado o valor não pode ser um DataFrame, e o pandas não é importado)
+    if 'pandas' in sys.modules and isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, dict):
+        return {k: _copy_result(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return tuple(_copy_result(v) for v in value)
+    if isinstance(value, list):
+        return [_copy_result(v) for v in value]
+    return value
+
+def cached_read(func):
+    """Decorator: memoriza o resultado da leitura enquanto data_version não mudar (LRU)."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__module__, func.__qualname__, get_db_name(), get_data_version(), _freeze(args), _freeze(kwargs))
+        try:
+            hash(key)
+        except TypeError:
+            return func(*args, **kwargs) # Argumento sem forma hasheável: lê sem cache
+        with _cache_lock:
+            if key in _cache:
+                _cache.move_to_end(key)
+                return _copy_result(_cache[key])
+
+        result = func(*args, **kwargs)
+
+        with _cache_lock:
+            # Uma escrita torna inalcançáveis as entradas das versões anteriores: saem já
+            if not _evict_stale(key[2], key[3]):
+                return result
+            _cache[key] = _copy_result(result)
+            while len(_cache) > CACHE_MAX_ENTRIES:
+                _cache.popitem(last=False) # Remove o menos usado recentemente
+        return result
+
+    wrapper.uncached = func
+    return wrapper
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+        _cache_versions.clear()
+
+# --- Datas ---
+# Datas são guardadas como INTEGER: dias desde 1970-01-01 (0 = 01/01/1970). Filtros por
+# período viram comparações de inteiros no índice e a conversão para date/datetime é feita
+# só aqui, sem parse de texto. No SQL, dia + 2440587.5 é o dia juliano correspondente,
+# aceito direto pelas funções de data do SQLite (date, strftime, julianday).
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Modelos com {column}: coluna (ou expressão) com dias desde 1970-01-01
+_DAY_TO_DATE_SQL = "date({column} + 2440587.5)"                          # 'YYYY-MM-DD'
+_DAY_TO_MONTH_SQL = "strftime('%Y-%m', {column} + 2440587.5)"            # 'YYYY-MM' (chave de reading_monthly)
+_DAY_TO_YEAR_SQL = "CAST(strftime('%Y', {column} + 2440587.5) AS INTEGER)"
+_DAY_TO_WEEKDAY_SQL = "((({column} % 7) + 10) % 7)"                      # 0 = segunda (01/01/1970 foi uma quinta)
+_DAY_MONTH_START_SQL = "({column} - CAST(strftime('%d', {column} + 2440587.5) AS INTEGER) + 1)"
+_DAY_MONTH_END_SQL = "(CAST(julianday({column} + 2440587.5, 'start of month', '+1 month') - 2440587.5 AS INTEGER) - 1)"
+_DATE_TO_DAY_SQL = "CAST(julianday({column}) - 2440587.5 AS INTEGER)"    # 'YYYY-MM-DD' -> dia (migração)
+
+def to_day_number(value):
+    """date, datetime, 'YYYY-MM-DD' ou dia (int) -> dias desde 1970-01-01 (None continua None)."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    elif isinstance(value, datetime):
+        value = value.date()
+    elif not isinstance(value, date):
+        return int(value) # Já é um dia (int ou inteiro do numpy)
+    return value.toordinal() - _EPOCH_ORDINAL
+
+def from_day_number(value):
+    """Dias desde 1970-01-01 -> date (None continua None)."""
+    return None if value is None else date.fromordinal(int(value) + _EPOCH_ORDINAL)
+
+def _day_numbers_to_datetime(series):
+    """Coluna de dias (nulos viram NaT) -> datetime64, de forma vetorizada."""
+    return pd.to_datetime(series, unit='D')
+
+def _datetimes_to_day_numbers(series):
+    """Série datetime64 (com NaT) -> dias como int/None, prontos para o SQLite."""
+    days = series.to_numpy(dtype='datetime64[D]').astype('int64').tolist()
+    return pd.Series([day if present else None for day, present in zip(days, series.notna())],
+                     index=series.index, dtype='object')
+
+def _month_day_range(month):
+    """'YYYY-MM' -> (primeiro, último) dia do mês em dias desde 1970-01-01."""
+    year, month_number = int(month[:4]), int(month[5:7])
+    next_month = date(year + month_number // 12, month_number % 12 + 1, 1)
+    return to_day_number(date(year, month_number, 1)), to_day_number(next_month) - 1
+
+# --- Migrações de Esquema ---
+# Cada migração recebe a conexão e roda dentro de uma transação. A versão do esquema
+# fica em PRAGMA user_version; a migração N é aplicada quando user_version < N.
+# Novas migrações devem ser sempre adicionadas ao FINAL da lista.
+
+def _migration_initial_schema(conn):
+    """Tabelas originais (IF NOT EXISTS para bancos criados antes das migrações)."""
     # Tabela de Livros
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS books (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             title TEXT NOT NULL,
@@ -30,7 +441,7 @@ def create_tables():
     ''')
 
     # Tabela de Log de Leitura
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS reading_log (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             book_id INTEGER NOT NULL,
@@ -41,98 +452,465 @@ def create_tables():
         )
     ''')
 
-    conn.commit()
-    conn.close()
+def _migration_access_path_indexes(conn):
+    """Índices para os filtros por livro/data do log e por status dos livros."""
+    # get_reading_log(book_id=..., start_date=...) e get_pages_read_for_book
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reading_log_book_date ON reading_log (book_id, log_date)")
+    # get_reading_log(start_date=..., end_date=...) e a ordenação por data
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reading_log_date ON reading_log (log_date)")
+    # get_books_by_status (filtro + ORDER BY title sem ordenação extra)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_status_title ON books (status, title)")
+
+def _create_reading_log_triggers(conn, name, add_sql, remove_sql, when=""):
+    """Cria os triggers AFTER INSERT/DELETE/UPDATE de reading_log de um agregado.
+
+    add_sql/remove_sql são modelos com {row} (NEW ou OLD); uma alteração é tratada
+    como a saída da linha antiga seguida da entrada da nova.
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_reading_log_{name}_ai AFTER INSERT ON reading_log
+        {when}
+        BEGIN
+            {add_sql.format(row='NEW')}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_reading_log_{name}_ad AFTER DELETE ON reading_log
+        {when}
+        BEGIN
+            {remove_sql.format(row='OLD')}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_reading_log_{name}_au
+        AFTER UPDATE OF book_id, log_date, pages_read ON reading_log
+        {when}
+        BEGIN
+            {remove_sql.format(row='OLD')}
+            {add_sql.format(row='NEW')}
+        END
+    """)
+
+# Trechos dos triggers de contadores: a última data é recalculada pelo índice (book_id, log_date)
+_COUNTERS_ADD_SQL = """
+    UPDATE books
+    SET pages_read_total = pages_read_total + {row}.pages_read,
+        last_log_date = (SELECT MAX(log_date) FROM reading_log WHERE book_id = {row}.book_id)
+    WHERE id = {row}.book_id;
+"""
+
+_COUNTERS_REMOVE_SQL = """
+    UPDATE books
+    SET pages_read_total = pages_read_total - {row}.pages_read,
+        last_log_date = (SELECT MAX(log_date) FROM reading_log WHERE book_id = {row}.book_id)
+    WHERE id = {row}.book_id;
+"""
+
+def _migration_book_counters(conn):
+    """Contadores desnormalizados em books, mantidos por triggers em reading_log."""
+    conn.execute("ALTER TABLE books ADD COLUMN pages_read_total INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE books ADD COLUMN last_log_date TEXT") # Formato YYYY-MM-DD
+
+    _create_reading_log_triggers(conn, 'counters', _COUNTERS_ADD_SQL, _COUNTERS_REMOVE_SQL)
+
+    # Preenche os contadores para os logs já existentes
+    _rebuild_book_counters(conn)
+
+# Trechos dos triggers de rollup: {row} é NEW (entrada) ou OLD (saída de uma linha).
+# book_count só muda quando a linha é a primeira/última do mesmo livro no dia (ou mês),
+# verificado pelo índice (book_id, log_date) em vez de uma tabela auxiliar.
+_ROLLUP_ADD_SQL = """
+    INSERT INTO reading_daily (log_date, pages_read, log_count, book_count)
+    VALUES ({row}.log_date, {row}.pages_read, 1,
+            NOT EXISTS (SELECT 1 FROM reading_log
+                        WHERE book_id = {row}.book_id AND log_date = {row}.log_date AND id <> {row}.id))
+    ON CONFLICT (log_date) DO UPDATE SET
+        pages_read = pages_read + excluded.pages_read,
+        log_count = log_count + 1,
+        book_count = book_count + excluded.book_count;
+    INSERT INTO reading_monthly (month, pages_read, log_count, book_count)
+    VALUES ({month}, {row}.pages_read, 1,
+            NOT EXISTS (SELECT 1 FROM reading_log
+                        WHERE book_id = {row}.book_id AND id <> {row}.id
+                          AND log_date BETWEEN {month_start} AND {month_end}))
+    ON CONFLICT (month) DO UPDATE SET
+        pages_read = pages_read + excluded.pages_read,
+        log_count = log_count + 1,
+        book_count = book_count + excluded.book_count;
+"""
+
+_ROLLUP_REMOVE_SQL = """
+    UPDATE reading_daily
+    SET pages_read = pages_read - {row}.pages_read,
+        log_count = log_count - 1,
+        book_count = book_count - NOT EXISTS (SELECT 1 FROM reading_log
+                                              WHERE book_id = {row}.book_id AND log_date = {row}.log_date AND id <> {row}.id)
+    WHERE log_date = {row}.log_date;
+    DELETE FROM reading_daily WHERE log_date = {row}.log_date AND log_count <= 0;
+    UPDATE reading_monthly
+    SET pages_read = pages_read - {row}.pages_read,
+        log_count = log_count - 1,
+        book_count = book_count - NOT EXISTS (SELECT 1 FROM reading_log
+                                              WHERE book_id = {row}.book_id AND id <> {row}.id
+                                                AND log_date BETWEEN {month_start} AND {month_end})
+    WHERE month = {month};
+    DELETE FROM reading_monthly WHERE month = {month} AND log_count <= 0;
+"""
+
+# Mês da linha ('YYYY-MM') e seus limites em dias; {row} continua no modelo
+_ROLLUP_MONTH_PARTS = {
+    'row': '{row}',
+    'month': _DAY_TO_MONTH_SQL.format(column='{row}.log_date'),
+    'month_start': _DAY_MONTH_START_SQL.format(column='{row}.log_date'),
+    'month_end': _DAY_MONTH_END_SQL.format(column='{row}.log_date'),
+}
+_ROLLUP_ADD_SQL = _ROLLUP_ADD_SQL.format(**_ROLLUP_MONTH_PARTS)
+_ROLLUP_REMOVE_SQL = _ROLLUP_REMOVE_SQL.format(**_ROLLUP_MONTH_PARTS)
+
+def _migration_reading_rollups(conn):
+    """Totais de leitura por dia e por mês, mantidos incrementalmente por triggers."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reading_daily (
+            log_date TEXT PRIMARY KEY, -- Formato YYYY-MM-DD
+            pages_read INTEGER NOT NULL,
+            log_count INTEGER NOT NULL,
+            book_count INTEGER NOT NULL -- Livros distintos lidos no dia
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reading_monthly (
+            month TEXT PRIMARY KEY, -- Formato YYYY-MM
+            pages_read INTEGER NOT NULL,
+            log_count INTEGER NOT NULL,
+            book_count INTEGER NOT NULL -- Livros distintos lidos no mês
+        ) WITHOUT ROWID
+    ''')
+
+    _create_reading_log_triggers(conn, 'rollups', _ROLLUP_ADD_SQL, _ROLLUP_REMOVE_SQL)
+
+    # Preenche os rollups com o histórico existente
+    _rebuild_rollups(conn)
+
+def _migration_data_version(conn):
+    """Contador de versão dos dados, incrementado por toda função de escrita."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)")
+
+# Os triggers de agregados só rodam quando trigger_control.deferred = 0. Cargas em lote
+# ligam a flag dentro da própria transação (invisível às outras conexões), inserem tudo
+# e recalculam os agregados uma única vez para as chaves afetadas.
+_AGGREGATES_ENABLED = "WHEN (SELECT deferred FROM trigger_control WHERE id = 1) = 0"
+
+def _migration_deferrable_aggregates(conn):
+    """Permite adiar os triggers de contadores/rollups durante importações em lote."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS trigger_control (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            deferred INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO trigger_control (id, deferred) VALUES (1, 0)")
+    for name, add_sql, remove_sql in [('counters', _COUNTERS_ADD_SQL, _COUNTERS_REMOVE_SQL),
+                                      ('rollups', _ROLLUP_ADD_SQL, _ROLLUP_REMOVE_SQL)]:
+        for suffix in ('ai', 'ad', 'au'):
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_reading_log_{name}_{suffix}")
+        _create_reading_log_triggers(conn, name, add_sql, remove_sql, when=_AGGREGATES_ENABLED)
+
+def _migration_finished_books_index(conn):
+    """Índice para 'livros concluídos no período' (status + intervalo de end_date)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_status_end_date ON books (status, end_date)")
+
+# Índices de busca em texto (FTS5) com conteúdo externo: guardam só o índice invertido e
+# leem o texto de books/reading_log. Os triggers repassam cada alteração ao índice (a
+# remoção de uma entrada precisa dos valores antigos). Só entram no índice as linhas em
+# que `indexed` é verdadeiro: registros sem nota (a maioria) não pagam o custo do FTS.
+_SEARCH_INDEXES = {
+    'books_fts': {'table': 'books', 'columns': ['title', 'author', 'genre'], 'indexed': "1"},
+    'notes_fts': {'table': 'reading_log', 'columns': ['notes'], 'indexed': "{row}.notes <> ''"},
+}
+
+def _search_index_rows_sql(fts_table, where=""):
+    """INSERT que indexa as linhas de origem (filtradas por where) que devem estar no índice."""
+    index = _SEARCH_INDEXES[fts_table]
+    cols = ", ".join(index['columns'])
+    condition = index['indexed'].format(row=index['table'])
+    return f"""
+        INSERT INTO {fts_table} (rowid, {cols})
+        SELECT id, {cols} FROM {index['table']} WHERE {condition}{where}
+    """
+
+def _create_search_index_triggers(conn, fts_table):
+    """Triggers que repassam as alterações da tabela de origem ao índice de busca."""
+    index = _SEARCH_INDEXES[fts_table]
+    table, cols = index['table'], ", ".join(index['columns'])
+    new_values = ", ".join(f"NEW.{c}" for c in index['columns'])
+    old_values = ", ".join(f"OLD.{c}" for c in index['columns'])
+    new_indexed, old_indexed = index['indexed'].format(row='NEW'), index['indexed'].format(row='OLD')
+    # A inserção também é adiada nas cargas em lote (ver bulk_add_log_entries)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_ai AFTER INSERT ON {table}
+        WHEN {new_indexed} AND (SELECT deferred FROM trigger_control WHERE id = 1) = 0
+        BEGIN
+            INSERT INTO {fts_table} (rowid, {cols}) VALUES (NEW.id, {new_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_ad AFTER DELETE ON {table}
+        WHEN {old_indexed}
+        BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {cols}) VALUES ('delete', OLD.id, {old_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {cols})
+            SELECT 'delete', OLD.id, {old_values} WHERE {old_indexed};
+            INSERT INTO {fts_table} (rowid, {cols})
+            SELECT NEW.id, {new_values} WHERE {new_indexed};
+        END
+    """)
+
+def _migration_search_index(conn):
+    """Busca em texto por título/autor/gênero dos livros e pelas notas de leitura."""
+    for fts_table, index in _SEARCH_INDEXES.items():
+        # remove_diacritics: "historia" encontra "história"
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+                {", ".join(index['columns'])}, content='{index['table']}', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+        _create_search_index_triggers(conn, fts_table)
+        # Indexa as linhas já existentes
+        conn.execute(_search_index_rows_sql(fts_table))
+
+def _migration_day_number_dates(conn):
+    """Datas de books/reading_log/reading_daily de 'YYYY-MM-DD' (TEXT) para dias (INTEGER).
+
+    reading_log é recriada (log_date continua NOT NULL) com os mesmos ids, então o índice
+    de notas continua válido; em books as colunas são trocadas com ALTER TABLE (recriar
+    books apagaria os registros pelo ON DELETE CASCADE). Contadores e rollups são
+    recalculados no novo formato, o que também corrige o que as migrações 3 e 4 tenham
+    calculado em bancos antigos com os trechos de SQL atuais, já escritos para dias.
+    """
+    for name in ('counters', 'rollups'):
+        for suffix in ('ai', 'ad', 'au'):
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_reading_log_{name}_{suffix}")
+    for index in ('idx_reading_log_book_date', 'idx_reading_log_date', 'idx_books_status_end_date'):
+        conn.execute(f"DROP INDEX IF EXISTS {index}")
+
+    # books: nova coluna INTEGER preenchida, a de texto removida e a nova renomeada
+    for column in ('start_date', 'end_date'):
+        conn.execute(f"ALTER TABLE books ADD COLUMN {column}_day INTEGER")
+        conn.execute(f"UPDATE books SET {column}_day = {_DATE_TO_DAY_SQL.format(column=column)}")
+        conn.execute(f"ALTER TABLE books DROP COLUMN {column}")
+        conn.execute(f"ALTER TABLE books RENAME COLUMN {column}_day TO {column}")
+    conn.execute("ALTER TABLE books DROP COLUMN last_log_date")
+    conn.execute("ALTER TABLE books ADD COLUMN last_log_date INTEGER") # Preenchida pelos contadores
+
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'reading_log'").fetchone()
+    conn.execute("""
+        CREATE TABLE reading_log_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_id INTEGER NOT NULL,
+            log_date INTEGER NOT NULL, -- Dias desde 1970-01-01
+            pages_read INTEGER NOT NULL,
+            notes TEXT,
+            FOREIGN KEY (book_id) REFERENCES books (id) ON DELETE CASCADE
+        )
+    """)
+    conn.execute(f"""
+        INSERT INTO reading_log_new (id, book_id, log_date, pages_read, notes)
+        SELECT id, book_id, {_DATE_TO_DAY_SQL.format(column='log_date')}, pages_read, notes FROM reading_log
+    """)
+    conn.execute("DROP TABLE reading_log")
+    conn.execute("ALTER TABLE reading_log_new RENAME TO reading_log")
+    if sequence is not None:
+        # Mantém a sequência do AUTOINCREMENT (ids de registros apagados não são reutilizados)
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'reading_log'", (sequence[0],))
+
+    conn.execute("DROP TABLE reading_daily")
+    conn.execute("""
+        CREATE TABLE reading_daily (
+            log_date INTEGER PRIMARY KEY, -- Dias desde 1970-01-01
+            pages_read INTEGER NOT NULL,
+            log_count INTEGER NOT NULL,
+            book_count INTEGER NOT NULL -- Livros distintos lidos no dia
+        ) WITHOUT ROWID
+    """)
+
+    _migration_access_path_indexes(conn)
+    _migration_finished_books_index(conn)
+    for name, add_sql, remove_sql in [('counters', _COUNTERS_ADD_SQL, _COUNTERS_REMOVE_SQL),
+                                      ('rollups', _ROLLUP_ADD_SQL, _ROLLUP_REMOVE_SQL)]:
+        _create_reading_log_triggers(conn, name, add_sql, remove_sql, when=_AGGREGATES_ENABLED)
+    _create_search_index_triggers(conn, 'notes_fts')
+    _rebuild_book_counters(conn)
+    _rebuild_rollups(conn)
+
+MIGRATIONS = [
+    _migration_initial_schema,         # 1
+    _migration_access_path_indexes,    # 2
+    _migration_book_counters,          # 3
+    _migration_reading_rollups,        # 4
+    _migration_data_version,           # 5
+    _migration_deferrable_aggregates,  # 6
+    _migration_finished_books_index,   # 7
+    _migration_search_index,           # 8
+    _migration_day_number_dates,       # 9
+]
+
+def get_schema_version(conn=None):
+    conn = conn or connect_db()
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def apply_migrations():
+    """Aplica, em ordem, as migrações ainda não aplicadas ao banco atual."""
+    _migrate(connect_db())
+
+def _migrate(conn):
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        if get_schema_version(conn) >= version:
+            continue
+        # BEGIN IMMEDIATE garante que só um processo migra por vez; a versão é relida
+        # dentro da transação caso outro processo tenha migrado enquanto esperávamos.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) < version:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    conn.execute("PRAGMA optimize")
+
+def create_tables():
+    """Cria/atualiza o esquema do banco (mantido por compatibilidade)."""
+    apply_migrations()
 
 # --- Funções CRUD para Livros ---
 
 def add_book(title, author, genre, total_pages, status, start_date=None, end_date=None):
     conn = connect_db()
-    cursor = conn.cursor()
-    start_date_str = start_date.strftime('%Y-%m-%d') if start_date else None
-    end_date_str = end_date.strftime('%Y-%m-%d') if end_date else None
-    cursor.execute('''
-        INSERT INTO books (title, author, genre, total_pages, status, start_date, end_date)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (title, author, genre, total_pages, status, start_date_str, end_date_str))
-    conn.commit()
-    conn.close()
+    with conn: # Commit ao final (ou rollback em caso de erro, liberando o lock de escrita)
+        cursor = conn.execute('''
+            INSERT INTO books (title, author, genre, total_pages, status, start_date, end_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (title, author, genre, total_pages, status, to_day_number(start_date), to_day_number(end_date)))
+        _bump_data_version(conn)
+    return cursor.lastrowid
 
+@cached_read
 def get_all_books():
     conn = connect_db()
     # Usando Pandas para ler diretamente do SQL para um DataFrame
     try:
-        df = pd.read_sql_query("SELECT * FROM books ORDER BY title", conn)
-        # Converter datas de string para datetime objects (se existirem)
-        if 'start_date' in df.columns:
-            df['start_date'] = pd.to_datetime(df['start_date'], errors='coerce').dt.date
-        if 'end_date' in df.columns:
-            df['end_date'] = pd.to_datetime(df['end_date'], errors='coerce').dt.date
+        df = pd.read_sql_query("""
+            SELECT id, title, author, genre, total_pages, status, start_date, end_date
+            FROM books ORDER BY title
+        """, conn)
+        # Converter datas (dias desde 1970-01-01) para date objects (se existirem)
+        for col in ('start_date', 'end_date'):
+            df[col] = _day_numbers_to_datetime(df[col]).dt.date
         return df
     except Exception as e:
         print(f"Erro ao buscar livros: {e}")
         # Retorna DataFrame vazio se a tabela não existir ou ocorrer erro
         return pd.DataFrame(columns=['id', 'title', 'author', 'genre', 'total_pages', 'status', 'start_date', 'end_date'])
-    finally:
-        conn.close()
 
 
+@cached_read
 def get_book_by_id(book_id):
     conn = connect_db()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM books WHERE id = ?", (book_id,))
     book = cursor.fetchone()
-    conn.close()
-    return dict(book) if book else None
+    if not book:
+        return None
+    book = dict(book)
+    for col in ('start_date', 'end_date', 'last_log_date'):
+        book[col] = from_day_number(book[col])
+    return book
+
+_BOOK_PAGE_COLUMNS = ['id', 'title', 'author', 'genre', 'total_pages', 'status', 'start_date', 'end_date']
+
+@cached_read
+def get_books_page(limit, after=None, status=None):
+    """Uma página dos livros por título (como get_all_books), por paginação keyset, sem pandas.
+
+    `after` é o cursor (title, id) do último livro da página anterior; com `status` a
+    consulta segue o índice (status, title). Retorna (livros como dicts com datas date,
+    total, next_cursor), com `next_cursor` None na última página.
+    """
+    query = f"SELECT {', '.join(_BOOK_PAGE_COLUMNS)} FROM books"
+    conditions, params = [], []
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    if after is not None:
+        conditions.append("(title, id) > (?, ?)")
+        params.extend([after[0], int(after[1])])
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY title, id LIMIT ?"
+    params.append(limit + 1)
+
+    cursor = connect_db().cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(query, params).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1][1], rows[-1][0])
+    books = [dict(zip(_BOOK_PAGE_COLUMNS, row)) for row in rows]
+    for book in books:
+        book['start_date'], book['end_date'] = from_day_number(book['start_date']), from_day_number(book['end_date'])
+    counts = count_books_by_status()
+    return books, counts.get(status, 0) if status else sum(counts.values()), next_cursor
 
 def update_book(book_id, title, author, genre, total_pages, status, start_date=None, end_date=None):
     conn = connect_db()
-    cursor = conn.cursor()
-    start_date_str = start_date.strftime('%Y-%m-%d') if start_date else None
-    end_date_str = end_date.strftime('%Y-%m-%d') if end_date else None
-    cursor.execute('''
-        UPDATE books
-        SET title = ?, author = ?, genre = ?, total_pages = ?, status = ?, start_date = ?, end_date = ?
-        WHERE id = ?
-    ''', (title, author, genre, total_pages, status, start_date_str, end_date_str, book_id))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute('''
+            UPDATE books
+            SET title = ?, author = ?, genre = ?, total_pages = ?, status = ?, start_date = ?, end_date = ?
+            WHERE id = ?
+        ''', (title, author, genre, total_pages, status, to_day_number(start_date), to_day_number(end_date), book_id))
+        _bump_data_version(conn)
 
 def delete_book(book_id):
     conn = connect_db()
-    cursor = conn.cursor()
-    # Deletar logs associados primeiro (CASCADE deve cuidar disso, mas é bom garantir)
-    # cursor.execute("DELETE FROM reading_log WHERE book_id = ?", (book_id,))
-    cursor.execute("DELETE FROM books WHERE id = ?", (book_id,))
-    conn.commit()
-    conn.close()
+    # Os logs associados são removidos pelo ON DELETE CASCADE (foreign_keys=ON em connect_db)
+    with conn:
+        conn.execute("DELETE FROM books WHERE id = ?", (book_id,))
+        _bump_data_version(conn)
 
+@cached_read
 def get_books_by_status(status):
      conn = connect_db()
      df = pd.read_sql_query("SELECT id, title FROM books WHERE status = ? ORDER BY title", conn, params=(status,))
-     conn.close()
      return df
 
 # --- Funções para Log de Leitura ---
 
 def add_log_entry(book_id, log_date, pages_read, notes=None):
     conn = connect_db()
-    cursor = conn.cursor()
-    log_date_str = log_date.strftime('%Y-%m-%d')
-    cursor.execute('''
-        INSERT INTO reading_log (book_id, log_date, pages_read, notes)
-        VALUES (?, ?, ?, ?)
-    ''', (book_id, log_date_str, pages_read, notes))
-    conn.commit()
-    conn.close()
+    with conn:
+        cursor = conn.execute('''
+            INSERT INTO reading_log (book_id, log_date, pages_read, notes)
+            VALUES (?, ?, ?, ?)
+        ''', (book_id, to_day_number(log_date), pages_read, notes))
+        _bump_data_version(conn)
+    return cursor.lastrowid
 
-def get_reading_log(book_id=None, start_date=None, end_date=None):
-    conn = connect_db()
-    query = """
-        SELECT rl.id, rl.log_date, rl.pages_read, rl.notes, b.title as book_title, rl.book_id
-        FROM reading_log rl
-        JOIN books b ON rl.book_id = b.id
-    """
+def _reading_log_filters(book_id=None, start_date=None, end_date=None):
+    """Condições/parâmetros de filtro do reading_log (alias rl) usados nas consultas de log."""
     params = []
     conditions = []
 
@@ -141,10 +919,21 @@ def get_reading_log(book_id=None, start_date=None, end_date=None):
         params.append(book_id)
     if start_date:
         conditions.append("rl.log_date >= ?")
-        params.append(start_date.strftime('%Y-%m-%d'))
+        params.append(to_day_number(start_date))
     if end_date:
         conditions.append("rl.log_date <= ?")
-        params.append(end_date.strftime('%Y-%m-%d'))
+        params.append(to_day_number(end_date))
+    return conditions, params
+
+@cached_read
+def get_reading_log(book_id=None, start_date=None, end_date=None):
+    conn = connect_db()
+    query = """
+        SELECT rl.id, rl.log_date, rl.pages_read, rl.notes, b.title as book_title, rl.book_id
+        FROM reading_log rl
+        JOIN books b ON rl.book_id = b.id
+    """
+    conditions, params = _reading_log_filters(book_id, start_date, end_date)
 
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
@@ -154,23 +943,981 @@ def get_reading_log(book_id=None, start_date=None, end_date=None):
     try:
         df = pd.read_sql_query(query, conn, params=params)
         if not df.empty:
-             df['log_date'] = pd.to_datetime(df['log_date']) # Converte para datetime
+             df['log_date'] = _day_numbers_to_datetime(df['log_date']) # Converte para datetime
         return df
     except Exception as e:
         print(f"Erro ao buscar log de leitura: {e}")
         return pd.DataFrame(columns=['id', 'log_date', 'pages_read', 'notes', 'book_title', 'book_id'])
-    finally:
-        conn.close()
 
+@cached_read
+def count_reading_log(book_id=None, start_date=None, end_date=None):
+    """Número de registros de leitura com os mesmos filtros de get_reading_log."""
+    conn = connect_db()
+    if not book_id:
+        # Sem filtro por livro, o rollup diário já tem a contagem (uma linha por dia)
+        query = "SELECT COALESCE(SUM(log_count), 0) FROM reading_daily rl"
+        conditions, params = _reading_log_filters(None, start_date, end_date)
+    else:
+        # Contagem pelo índice (book_id, log_date), sem ler as linhas do log
+        query = "SELECT COUNT(*) FROM reading_log rl"
+        conditions, params = _reading_log_filters(book_id, start_date, end_date)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return conn.execute(query, params).fetchone()[0]
+
+_LOG_PAGE_COLUMNS = ['id', 'log_date', 'pages_read', 'notes', 'book_title', 'book_id']
 
+def _reading_log_page_rows(limit, after, book_id, start_date, end_date):
+    """Tuplas (_LOG_PAGE_COLUMNS, log_date em dias) de uma página do histórico e o next_cursor."""
+    query = """
+        SELECT rl.id, rl.log_date, rl.pages_read, rl.notes, b.title as book_title, rl.book_id
+        FROM reading_log rl
+        JOIN books b ON rl.book_id = b.id
+    """
+    conditions, params = _reading_log_filters(book_id, start_date, end_date)
+    if after is not None:
+        after_date, after_id = after
+        conditions.append("(rl.log_date, rl.id) < (?, ?)")
+        params.extend([to_day_number(after_date), int(after_id)])
+
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY rl.log_date DESC, rl.id DESC LIMIT ?"
+    params.append(limit + 1) # Uma linha extra indica se existe próxima página
+
+    cursor = connect_db().cursor()
+    cursor.row_factory = None
+    rows = cursor.execute(query, params).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1][1], rows[-1][0])
+    return rows, next_cursor
+
+@cached_read
+def get_reading_log_page(limit, after=None, book_id=None, start_date=None, end_date=None):
+    """Uma página do histórico, na mesma ordem de get_reading_log, por paginação keyset.
+
+    `after` é o cursor (log_date, id) do último registro da página anterior; a consulta
+    continua a partir dele pelo índice, sem OFFSET. Retorna (df, total, next_cursor):
+    `total` é a contagem filtrada (count_reading_log) e `next_cursor` é None na última página.
+    """
+    rows, next_cursor = _reading_log_page_rows(limit, after, book_id, start_date, end_date)
+    df = pd.DataFrame(rows, columns=_LOG_PAGE_COLUMNS)
+    df['log_date'] = _day_numbers_to_datetime(df['log_date'])
+    return df, count_reading_log(book_id, start_date, end_date), next_cursor
+
+@cached_read
+def get_reading_log_page_records(limit, after=None, book_id=None, start_date=None, end_date=None):
+    """Como get_reading_log_page, com a página como lista de dicts (log_date como date), sem pandas."""
+    rows, next_cursor = _reading_log_page_rows(limit, after, book_id, start_date, end_date)
+    records = [dict(zip(_LOG_PAGE_COLUMNS, row)) for row in rows]
+    for record in records:
+        record['log_date'] = from_day_number(record['log_date'])
+    return records, count_reading_log(book_id, start_date, end_date), next_cursor
+
+@cached_read
 def get_pages_read_for_book(book_id):
     conn = connect_db()
     cursor = conn.cursor()
-    cursor.execute("SELECT SUM(pages_read) FROM reading_log WHERE book_id = ?", (book_id,))
+    # Contador mantido pelos triggers do reading_log (ver _migration_book_counters)
+    cursor.execute("SELECT pages_read_total FROM books WHERE id = ?", (book_id,))
     result = cursor.fetchone()
-    conn.close()
     return result[0] if result and result[0] is not None else 0
 
+@cached_read
+def get_progress_for_books(book_ids=None, status=None):
+    """Progresso de vários livros em uma única consulta.
+
+    Filtra por uma lista de IDs e/ou por status. Retorna um DataFrame com
+    book_id, pages_read, progress_pct (0-100) e last_log_date.
+    """
+    conn = connect_db()
+    # Lê os contadores mantidos por trigger: sem varrer o reading_log
+    query = """
+        SELECT b.id AS book_id, b.total_pages,
+               b.pages_read_total AS pages_read, b.last_log_date
+        FROM books b
+    """
+    params = []
+    conditions = []
+
+    if book_ids is not None:
+        # Um único parâmetro JSON evita o limite de variáveis do SQLite em listas grandes
+        conditions.append("b.id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps([int(i) for i in book_ids]))
+    if status:
+        conditions.append("b.status = ?")
+        params.append(status)
+
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    df = pd.read_sql_query(query, conn, params=params)
+    total_pages = df['total_pages'].where(df['total_pages'] > 0)
+    df['progress_pct'] = (df['pages_read'] / total_pages * 100).clip(upper=100).fillna(0.0)
+    df['last_log_date'] = _day_numbers_to_datetime(df['last_log_date'])
+    return df[['book_id', 'pages_read', 'progress_pct', 'last_log_date']]
+
+# --- Estatísticas (agregações feitas no SQLite) ---
+# Filtros por período usam intervalos de dias indexados (nunca strftime na coluna filtrada)
+# e as consultas de leitura usam o rollup diário, que já equivale a
+# "GROUP BY log_date" do reading_log: COUNT(*) ali é o COUNT(DISTINCT log_date).
+
+WEEKDAY_NAMES = ["Segunda-feira", "Terça-feira", "Quarta-feira", "Quinta-feira", "Sexta-feira", "Sábado", "Domingo"]
+
+def year_range(year):
+    """Primeiro e último dia do ano, para os filtros por período."""
+    return date(year, 1, 1), date(year, 12, 31)
+
+@cached_read
+def get_reading_summary(start_date=None, end_date=None):
+    """Páginas lidas, registros, dias com leitura e média de páginas por dia lido no período."""
+    conn = connect_db()
+    query = """
+        SELECT COALESCE(SUM(pages_read), 0) AS pages_read,
+               COALESCE(SUM(log_count), 0) AS log_count,
+               COUNT(*) AS reading_days
+        FROM reading_daily rl
+    """
+    conditions, params = _reading_log_filters(None, start_date, end_date)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    summary = dict(conn.execute(query, params).fetchone())
+    summary['avg_pages_per_day'] = summary['pages_read'] / summary['reading_days'] if summary['reading_days'] > 0 else 0
+    return summary
+
+@cached_read
+def count_books_by_status():
+    """Quantidade de livros por status (todos os status presentes, inclusive com 0)."""
+    conn = connect_db()
+    counts = dict(conn.execute("SELECT status, COUNT(*) FROM books GROUP BY status").fetchall())
+    return {status: counts.get(status, 0) for status in BOOK_STATUSES}
+
+@cached_read
+def get_finished_books_performance():
+    """Livros concluídos com datas válidas: dias de leitura (inclusive) e média de páginas/dia."""
+    conn = connect_db()
+    return pd.read_sql_query("""
+        SELECT title, total_pages, reading_days, CAST(total_pages AS REAL) / reading_days AS pages_per_day
+        FROM (
+            SELECT title, total_pages,
+                   end_date - start_date + 1 AS reading_days
+            FROM books
+            WHERE status = 'concluído' AND start_date IS NOT NULL AND end_date IS NOT NULL
+        )
+        WHERE reading_days > 0
+        ORDER BY title
+    """, conn)
+
+@cached_read
+def get_finished_books_by_year(start_date, end_date):
+    """Livros concluídos no período agrupados por (ano de conclusão, gênero)."""
+    conn = connect_db()
+    return pd.read_sql_query(f"""
+        SELECT {_DAY_TO_YEAR_SQL.format(column='end_date')} AS year,
+               COALESCE(NULLIF(TRIM(genre), ''), 'Não especificado') AS genre, COUNT(*) AS count
+        FROM books
+        WHERE status = 'concluído' AND end_date BETWEEN ? AND ?
+        GROUP BY 1, 2
+    """, conn, params=(to_day_number(start_date), to_day_number(end_date)))
+
+@cached_read
+def get_year_bounds():
+    """Primeiro e último ano com leituras ou livros concluídos, ou None se não houver dados."""
+    conn = connect_db()
+    row = conn.execute(f"""
+        SELECT MIN(first_year), MAX(last_year) FROM (
+            SELECT CAST(substr(MIN(month), 1, 4) AS INTEGER) AS first_year,
+                   CAST(substr(MAX(month), 1, 4) AS INTEGER) AS last_year
+            FROM reading_monthly
+            UNION ALL
+            SELECT {_DAY_TO_YEAR_SQL.format(column='MIN(end_date)')}, {_DAY_TO_YEAR_SQL.format(column='MAX(end_date)')}
+            FROM books WHERE status = 'concluído'
+        )
+    """).fetchone()
+    return (row[0], row[1]) if row[0] is not None else None
+
+# Início de cada período (dia, semana começando na segunda ou mês) a partir do rollup diário
+TIMESERIES_BUCKETS = {
+    'day': "rl.log_date",
+    'week': "rl.log_date - " + _DAY_TO_WEEKDAY_SQL.format(column='rl.log_date'),
+    'month': _DAY_MONTH_START_SQL.format(column='rl.log_date'),
+}
+
+@cached_read
+def get_reading_date_bounds():
+    """Primeira e última data com leitura (rollup diário), ou None se não houver registros."""
+    conn = connect_db()
+    row = conn.execute("SELECT MIN(log_date), MAX(log_date) FROM reading_daily").fetchone()
+    if row[0] is None:
+        return None
+    return from_day_number(row[0]), from_day_number(row[1])
+
+@cached_read
+def get_reading_timeseries(resolution='day', start_date=None, end_date=None):
+    """Páginas lidas por período (day, week ou month) e total acumulado desde o primeiro registro.
+
+    Agrega o rollup diário no SQLite; o acumulado já inclui as páginas anteriores a start_date.
+    Retorna period (datetime do início do período), pages_read e cumulative_pages.
+    """
+    if resolution not in TIMESERIES_BUCKETS:
+        raise ValueError(f"Resolução inválida: {resolution}")
+    conn = connect_db()
+    conditions, params = _reading_log_filters(None, start_date, end_date)
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    offset_query = "SELECT COALESCE(SUM(pages_read), 0) FROM reading_daily WHERE log_date < ?"
+    offset = conn.execute(offset_query, (to_day_number(start_date),)).fetchone()[0] if start_date else 0
+    df = pd.read_sql_query(f"""
+        SELECT period, pages_read, ? + SUM(pages_read) OVER (ORDER BY period) AS cumulative_pages
+        FROM (
+            SELECT {TIMESERIES_BUCKETS[resolution]} AS period, SUM(rl.pages_read) AS pages_read
+            FROM reading_daily rl{where}
+            GROUP BY 1
+        )
+        ORDER BY period
+    """, conn, params=[offset] + params)
+    df['period'] = _day_numbers_to_datetime(df['period'])
+    return df
+
+# --- Busca em Texto (FTS5) ---
+
+SEARCH_SNIPPET_TOKENS = 12
+
+def _fts_query(text):
+    """Converte o texto digitado em uma consulta FTS5: todos os termos, cada um como prefixo.
+
+    Os termos são colocados entre aspas, então operadores e pontuação do usuário
+    (AND, NOT, *, :, parênteses...) não geram erro de sintaxe.
+    """
+    terms = [term.replace('"', '""') for term in text.split()]
+    return " ".join(f'"{term}"*' for term in terms if term.strip('"'))
+
+@cached_read
+def search_books(text, limit=20):
+    """Livros cujo título, autor ou gênero contêm os termos (prefixos), por relevância (bm25).
+
+    Retorna id, title, author, genre, status, rank (menor = mais relevante) e snippet
+    (trecho do campo encontrado com os termos entre **).
+    """
+    conn = connect_db()
+    query = _fts_query(text)
+    if not query:
+        return pd.DataFrame(columns=['id', 'title', 'author', 'genre', 'status', 'rank', 'snippet'])
+    # Título pesa mais que autor, que pesa mais que gênero
+    return pd.read_sql_query(f"""
+        SELECT b.id, b.title, b.author, b.genre, b.status,
+               bm25(books_fts, 10.0, 5.0, 1.0) AS rank,
+               snippet(books_fts, -1, '**', '**', '…', {SEARCH_SNIPPET_TOKENS}) AS snippet
+        FROM books_fts
+        JOIN books b ON b.id = books_fts.rowid
+        WHERE books_fts MATCH ?
+        ORDER BY rank
+        LIMIT ?
+    """, conn, params=(query, limit))
+
+@cached_read
+def search_notes(text, limit=20, book_id=None):
+    """Registros de leitura cujas notas contêm os termos (prefixos), por relevância (bm25).
+
+    Retorna id, log_date, pages_read, book_id, book_title, rank e snippet da nota.
+    """
+    conn = connect_db()
+    query = _fts_query(text)
+    if not query:
+        return pd.DataFrame(columns=['id', 'log_date', 'pages_read', 'book_id', 'book_title', 'rank', 'snippet'])
+    conditions, params = _reading_log_filters(book_id)
+    book_filter = " AND " + " AND ".join(conditions) if conditions else ""
+    df = pd.read_sql_query(f"""
+        SELECT rl.id, rl.log_date, rl.pages_read, rl.book_id, b.title AS book_title,
+               bm25(notes_fts) AS rank,
+               snippet(notes_fts, 0, '**', '**', '…', {SEARCH_SNIPPET_TOKENS}) AS snippet
+        FROM notes_fts
+        JOIN reading_log rl ON rl.id = notes_fts.rowid
+        JOIN books b ON b.id = rl.book_id
+        WHERE notes_fts MATCH ?{book_filter}
+        ORDER BY rank
+        LIMIT ?
+    """, conn, params=[query] + params + [limit])
+    df['log_date'] = _day_numbers_to_datetime(df['log_date'])
+    return df
+
+def rebuild_search_index():
+    """Reconstrói os índices de busca a partir de books/reading_log."""
+    conn = connect_db()
+    with conn:
+        for fts_table in _SEARCH_INDEXES:
+            conn.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('delete-all')")
+            conn.execute(_search_index_rows_sql(fts_table))
+            conn.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('optimize')")
+        _bump_data_version(conn)
+
+# --- Importação em Lote ---
+
+BOOK_STATUSES = ['lendo', 'concluído', 'abandonado', 'desejado']
+
+def _normalize_key_part(series):
+    return series.fillna('').astype(str).str.strip().str.casefold()
+
+def get_book_keys():
+    """Conjunto (título, autor) normalizado de todos os livros, para checagem de duplicatas."""
+    conn = connect_db()
+    rows = conn.execute("SELECT title, author FROM books").fetchall()
+    return {(str(t).strip().casefold(), str(a).strip().casefold()) for t, a in rows}
+
+def _parse_optional_dates(series, errors):
+    """Converte datas opcionais em dias; valores preenchidos que não são datas viram erro da linha."""
+    parsed = pd.to_datetime(series, errors='coerce')
+    invalid = series.notna() & (series.astype(str).str.strip() != '') & parsed.isna()
+    errors[invalid] += f"{series.name} inválida; "
+    return _datetimes_to_day_numbers(parsed)
+
+def bulk_add_books(df, existing_keys=None):
+    """Importa um DataFrame de livros em uma única transação.
+
+    Colunas obrigatórias: title, author, total_pages, status; opcionais: genre,
+    start_date, end_date. A validação é vetorizada e linhas inválidas são
+    reportadas (não interrompem a importação). Duplicatas por (título, autor)
+    normalizados, no banco ou no próprio arquivo, são puladas. `existing_keys`
+    permite reaproveitar (e atualizar) o conjunto de chaves entre várias chamadas.
+
+    Retorna {'imported': int, 'skipped': int, 'errors': DataFrame(row, title, error)},
+    onde `row` é a linha no CSV (índice + 2, contando o cabeçalho).
+    """
+    if existing_keys is None:
+        existing_keys = get_book_keys()
+
+    errors = pd.Series('', index=df.index)
+
+    title = df['title'].fillna('').astype(str).str.strip()
+    author = df['author'].fillna('').astype(str).str.strip()
+    errors[title == ''] += "título vazio; "
+    errors[author == ''] += "autor(a) vazio; "
+
+    status = df['status'].fillna('').astype(str).str.strip()
+    errors[~status.isin(BOOK_STATUSES)] += f"status inválido (válidos: {', '.join(BOOK_STATUSES)}); "
+
+    total_pages = pd.to_numeric(df['total_pages'], errors='coerce')
+    invalid_pages = total_pages.isna() | (total_pages <= 0) | (total_pages % 1 != 0)
+    errors[invalid_pages] += "total_pages deve ser um inteiro maior que 0; "
+
+    empty_column = pd.Series(None, index=df.index, dtype='object')
+    genre = df['genre'] if 'genre' in df.columns else empty_column
+    genre = genre.where(genre.notna(), None)
+    start_date = _parse_optional_dates(df['start_date'] if 'start_date' in df.columns else empty_column.rename('start_date'), errors)
+    end_date = _parse_optional_dates(df['end_date'] if 'end_date' in df.columns else empty_column.rename('end_date'), errors)
+
+    valid = errors == ''
+
+    # Duplicatas: chaves já no banco ou repetidas dentro do próprio arquivo (mantém a 1ª)
+    keys = pd.Series(list(zip(_normalize_key_part(title), _normalize_key_part(author))), index=df.index)
+    duplicate = valid & (keys.isin(existing_keys) | keys.duplicated())
+    to_insert = valid & ~duplicate
+
+    rows = list(zip(
+        title[to_insert], author[to_insert], genre[to_insert],
+        total_pages[to_insert].astype('int64').tolist(), status[to_insert],
+        start_date[to_insert], end_date[to_insert],
+    ))
+    if rows:
+        conn = connect_db()
+        with conn:
+            conn.executemany('''
+                INSERT INTO books (title, author, genre, total_pages, status, start_date, end_date)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            _bump_data_version(conn)
+        existing_keys.update(keys[to_insert])
+
+    error_report = pd.DataFrame({
+        'row': df.index[~valid] + 2,
+        'title': df.loc[~valid, 'title'],
+        'error': errors[~valid].str.rstrip('; '),
+    })
+    return {'imported': len(rows), 'skipped': int(duplicate.sum()), 'errors': error_report}
+
+IMPORT_CHUNK_SIZE = 5000
+
+def sniff_csv_delimiter(file_obj, sample_size=64 * 1024):
+    """Detecta o delimitador (',', ';' ou tab) pelo início do arquivo e volta ao início."""
+    sample = file_obj.read(sample_size)
+    file_obj.seek(0)
+    if isinstance(sample, bytes):
+        sample = sample.decode('utf-8', errors='ignore')
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=',;\t').delimiter
+    except csv.Error:
+        return ','
+
+def iter_import_books_csv(file_obj, sep=None, chunk_size=IMPORT_CHUNK_SIZE, start_chunk=0):
+    """Importa um CSV de livros em blocos de `chunk_size` linhas, com commit por bloco.
+
+    A memória fica limitada a um bloco, independente do tamanho do arquivo. Gera
+    (chunk_index, result, bytes_read) após cada bloco confirmado, onde `result` é o
+    retorno de bulk_add_books. Blocos anteriores a `start_chunk` (já confirmados em
+    uma tentativa anterior) são lidos mas não reimportados.
+    """
+    sep = sep or sniff_csv_delimiter(file_obj)
+    existing_keys = get_book_keys() # Carregado uma vez e atualizado a cada bloco
+    with pd.read_csv(file_obj, sep=sep, chunksize=chunk_size) as reader:
+        for chunk_index, chunk in enumerate(reader):
+            if chunk_index < start_chunk:
+                continue
+            result = bulk_add_books(chunk, existing_keys=existing_keys)
+            yield chunk_index, result, file_obj.tell()
+
+LOG_IMPORT_BATCH_SIZE = 10000
+
+def _build_book_index(conn):
+    """Índices em memória para resolver livros em importações, montados uma única vez.
+
+    Retorna (ids, {(título, autor): id}, {título: id}); títulos repetidos entre
+    autores diferentes ficam como None no índice só por título (ambíguos).
+    """
+    ids = set()
+    by_title_author = {}
+    by_title = {}
+    for book_id, title, author in conn.execute("SELECT id, title, author FROM books"):
+        title_key = str(title).strip().casefold()
+        ids.add(book_id)
+        by_title_author[(title_key, str(author).strip().casefold())] = book_id
+        by_title[title_key] = None if title_key in by_title else book_id
+    return ids, by_title_author, by_title
+
+def bulk_add_log_entries(df, row_offset=2):
+    """Importa um DataFrame de registros de leitura em uma única transação.
+
+    O livro é identificado por `book_id` ou por `title` (ou `book_title`, como no
+    export) com `author` opcional. Demais colunas: log_date, pages_read e notes
+    (opcional). Linhas inválidas ou de livros não encontrados são reportadas.
+    Os triggers de contadores, rollups e do índice de notas ficam adiados durante a
+    carga; os agregados são recalculados uma vez, só para os livros e dias afetados,
+    e as notas novas são indexadas em um único INSERT ... SELECT.
+
+    Retorna {'imported': int, 'errors': DataFrame(row, title, error)}; `row` é o índice
+    da linha + row_offset (o padrão 2 dá a linha do arquivo CSV, contando o cabeçalho).
+    """
+    conn = connect_db()
+    known_ids, by_title_author, by_title = _build_book_index(conn)
+    errors = pd.Series('', index=df.index)
+
+    book_id = pd.Series(float('nan'), index=df.index)
+    if 'book_id' in df.columns:
+        book_id = pd.to_numeric(df['book_id'], errors='coerce')
+        book_id = book_id.where(book_id.isin(known_ids))
+
+    title_col = 'title' if 'title' in df.columns else 'book_title' if 'book_title' in df.columns else None
+    if title_col:
+        titles = _normalize_key_part(df[title_col])
+        if 'author' in df.columns:
+            keys = pd.Series(list(zip(titles, _normalize_key_part(df['author']))), index=df.index)
+            book_id = book_id.fillna(keys.map(by_title_author))
+        book_id = book_id.fillna(titles.map(by_title))
+    errors[book_id.isna()] += "livro não encontrado (ou título ambíguo sem autor); "
+
+    log_date = pd.to_datetime(df['log_date'], errors='coerce')
+    errors[log_date.isna()] += "log_date inválida; "
+
+    pages_read = pd.to_numeric(df['pages_read'], errors='coerce')
+    errors[pages_read.isna() | (pages_read <= 0) | (pages_read % 1 != 0)] += "pages_read deve ser um inteiro maior que 0; "
+
+    notes = df['notes'].where(df['notes'].notna(), None) if 'notes' in df.columns else pd.Series(None, index=df.index, dtype='object')
+
+    valid = errors == ''
+    log_days = log_date[valid].to_numpy(dtype='datetime64[D]').astype('int64').tolist()
+    rows = list(zip(book_id[valid].astype('int64').tolist(), log_days,
+                    pages_read[valid].astype('int64').tolist(), notes[valid]))
+
+    if rows:
+        with conn:
+            # A escrita abre a transação (e trava o banco) antes de ler o maior id: um registro
+            # gravado por outra conexão antes disso já foi indexado pelo trigger e não pode
+            # entrar de novo. Os novos recebem ids maiores que esse (AUTOINCREMENT)
+            conn.execute("UPDATE trigger_control SET deferred = 1 WHERE id = 1")
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM reading_log").fetchone()[0]
+            for start in range(0, len(rows), LOG_IMPORT_BATCH_SIZE):
+                conn.executemany('''
+                    INSERT INTO reading_log (book_id, log_date, pages_read, notes)
+                    VALUES (?, ?, ?, ?)
+                ''', rows[start:start + LOG_IMPORT_BATCH_SIZE])
+            conn.execute("UPDATE trigger_control SET deferred = 0 WHERE id = 1")
+            _rebuild_book_counters(conn, book_ids=set(book_id[valid].astype('int64')))
+            _rebuild_rollups(conn, log_dates=set(log_days))
+            conn.execute(_search_index_rows_sql('notes_fts', where=" AND id > ?"), (last_id,))
+            _bump_data_version(conn)
+
+    error_report = pd.DataFrame({
+        'row': df.index[~valid] + row_offset,
+        'title': df.loc[~valid, title_col] if title_col else df.loc[~valid, 'book_id'],
+        'error': errors[~valid].str.rstrip('; '),
+    })
+    return {'imported': len(rows), 'errors': error_report}
+
+# --- Exportação em Fluxo ---
+# As linhas vão do cursor SQLite direto para o arquivo em blocos de EXPORT_CHUNK_SIZE,
+# então a memória usada depende do tamanho do bloco e não do tamanho da tabela.
+
+EXPORT_CHUNK_SIZE = 5000
+
+# Mesmas colunas de get_all_books / get_reading_log; {nome} é uma coluna de data
+EXPORT_QUERIES = {
+    'books': """
+        SELECT id, title, author, genre, total_pages, status, {start_date}, {end_date}
+        FROM books ORDER BY title
+    """,
+    'reading_log': """
+        SELECT rl.id, {log_date}, rl.pages_read, rl.notes, b.title AS book_title, rl.book_id
+        FROM reading_log rl
+        JOIN books b ON rl.book_id = b.id
+        ORDER BY rl.id -- Ordem de inserção: varredura sequencial, sem ordenar pelo índice de data
+    """,
+}
+
+EXPORT_DATE_COLUMNS = {
+    'books': {'start_date': 'start_date', 'end_date': 'end_date'},
+    'reading_log': {'log_date': 'rl.log_date'},
+}
+
+def _export_cursor(table, iso_dates=True):
+    """Cursor de tuplas do export; datas em 'YYYY-MM-DD' ou, com iso_dates=False, em dias."""
+    date_columns = {name: (_DAY_TO_DATE_SQL.format(column=column) if iso_dates else column) + f" AS {name}"
+                    for name, column in EXPORT_DATE_COLUMNS[table].items()}
+    cursor = connect_db().cursor()
+    cursor.row_factory = None # Tuplas simples: bem mais baratas que sqlite3.Row em volume
+    return cursor.execute(EXPORT_QUERIES[table].format(**date_columns))
+
+def _iter_fetchmany(cursor, chunk_size):
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+def export_table_csv(table, binary_file, chunk_size=EXPORT_CHUNK_SIZE):
+    """Escreve `table` ('books' ou 'reading_log') como CSV UTF-8 em um arquivo binário.
+
+    O arquivo continua aberto ao final. Retorna o número de linhas exportadas.
+    """
+    cursor = _export_cursor(table)
+    text_file = io.TextIOWrapper(binary_file, encoding='utf-8', newline='')
+    try:
+        writer = csv.writer(text_file)
+        writer.writerow([c[0] for c in cursor.description])
+        row_count = 0
+        for rows in _iter_fetchmany(cursor, chunk_size):
+            writer.writerows(rows)
+            row_count += len(rows)
+        return row_count
+    finally:
+        text_file.flush()
+        text_file.detach() # Não fecha o arquivo de quem chamou
+
+# --- Parquet (Arrow) ---
+# pyarrow é opcional: só é importado quando um export/import Parquet é usado.
+# Cada bloco lido do cursor vira um row group; blocos maiores comprimem melhor.
+
+PARQUET_ROW_GROUP_SIZE = 100000
+
+# Tipos Arrow das colunas exportadas: inteiros e datas continuam tipados no arquivo
+PARQUET_COLUMN_TYPES = {
+    'books': {'id': 'int64', 'title': 'string', 'author': 'string', 'genre': 'string',
+              'total_pages': 'int32', 'status': 'string', 'start_date': 'date32', 'end_date': 'date32'},
+    'reading_log': {'id': 'int64', 'log_date': 'date32', 'pages_read': 'int32', 'notes': 'string',
+                    'book_title': 'string', 'book_id': 'int64'},
+}
+
+def export_table_parquet(table, binary_file, chunk_size=PARQUET_ROW_GROUP_SIZE):
+    """Escreve `table` como Parquet (zstd) em `binary_file`, um row group por bloco do cursor.
+
+    Retorna o número de linhas exportadas.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    column_types = PARQUET_COLUMN_TYPES[table]
+    schema = pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in column_types.items()])
+    cursor = _export_cursor(table, iso_dates=False)
+    columns = [c[0] for c in cursor.description]
+    row_count = 0
+    with pq.ParquetWriter(binary_file, schema, compression='zstd') as writer:
+        for rows in _iter_fetchmany(cursor, chunk_size):
+            arrays = []
+            for name, values in zip(columns, zip(*rows)):
+                if column_types[name] == 'date32':
+                    arrays.append(pa.array(values, pa.int32()).cast(pa.date32())) # date32 também conta dias desde 1970
+                else:
+                    arrays.append(pa.array(values, schema.field(name).type))
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            row_count += len(rows)
+    return row_count
+
+def parquet_columns(file_obj):
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(file_obj).schema_arrow.names
+
+def iter_parquet_chunks(file_obj, columns=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Gera DataFrames de até `chunk_size` linhas lendo só as `columns` existentes no arquivo.
+
+    Datas chegam como datetime64 (sem parse de texto) e o índice é contínuo entre blocos.
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(file_obj)
+    if columns is not None:
+        columns = [c for c in columns if c in parquet_file.schema_arrow.names]
+    offset = 0
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+        chunk = batch.to_pandas(date_as_object=False)
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        yield chunk
+
+def read_parquet(file_obj, columns=None):
+    """Lê um Parquet inteiro (com projeção de colunas) para um DataFrame."""
+    chunks = list(iter_parquet_chunks(file_obj, columns, chunk_size=PARQUET_ROW_GROUP_SIZE))
+    return pd.concat(chunks) if chunks else pd.DataFrame(columns=columns or [])
+
+BOOK_IMPORT_COLUMNS = ['title', 'author', 'genre', 'total_pages', 'status', 'start_date', 'end_date']
+
+def iter_import_books_parquet(file_obj, chunk_size=IMPORT_CHUNK_SIZE, start_chunk=0):
+    """Como iter_import_books_csv, mas lendo um Parquet por lotes e só com as colunas usadas."""
+    existing_keys = get_book_keys()
+    for chunk_index, chunk in enumerate(iter_parquet_chunks(file_obj, BOOK_IMPORT_COLUMNS, chunk_size)):
+        if chunk_index < start_chunk:
+            continue
+        result = bulk_add_books(chunk, existing_keys=existing_keys)
+        yield chunk_index, result, file_obj.tell()
+
+EXPORT_WRITERS = {
+    'csv': export_table_csv,
+    'parquet': export_table_parquet,
+}
+
+def export_bundle_zip(binary_file, tables=('books', 'reading_log'), file_format='csv'):
+    """Escreve um ZIP com um arquivo por tabela (ex.: books.csv, reading_log.csv) em `binary_file`."""
+    export_table = EXPORT_WRITERS[file_format]
+    with zipfile.ZipFile(binary_file, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+        for table in tables:
+            with bundle.open(f"{table}.{file_format}", 'w') as member:
+                export_table(table, member)
+
+# --- Contadores Desnormalizados (books.pages_read_total / books.last_log_date) ---
+
+_BOOK_COUNTERS_QUERY = """
+    SELECT b.id AS book_id,
+           b.pages_read_total, COALESCE(agg.pages_read, 0) AS expected_pages_read_total,
+           b.last_log_date, agg.last_log_date AS expected_last_log_date
+    FROM books b
+    LEFT JOIN (
+        SELECT book_id, SUM(pages_read) AS pages_read, MAX(log_date) AS last_log_date
+        FROM reading_log GROUP BY book_id
+    ) agg ON agg.book_id = b.id
+"""
+
+def _rebuild_book_counters(conn, book_ids=None):
+    """Recalcula os contadores de todos os livros ou só dos IDs informados."""
+    query = '''
+        UPDATE books
+        SET pages_read_total = COALESCE((SELECT SUM(pages_read) FROM reading_log WHERE book_id = books.id), 0),
+            last_log_date = (SELECT MAX(log_date) FROM reading_log WHERE book_id = books.id)
+    '''
+    if book_ids is None:
+        conn.execute(query)
+    else:
+        conn.execute(query + " WHERE id IN (SELECT value FROM json_each(?))",
+                     (json.dumps(sorted({int(i) for i in book_ids})),))
+
+def check_book_counters():
+    """Retorna os livros cujos contadores divergem do reading_log (vazio = consistente)."""
+    conn = connect_db()
+    return pd.read_sql_query(_BOOK_COUNTERS_QUERY + """
+        WHERE b.pages_read_total IS NOT COALESCE(agg.pages_read, 0)
+           OR b.last_log_date IS NOT agg.last_log_date
+    """, conn)
+
+def rebuild_book_counters():
+    """Recalcula os contadores de todos os livros a partir do reading_log."""
+    conn = connect_db()
+    with conn:
+        _rebuild_book_counters(conn)
+        _bump_data_version(conn)
+
+# --- Rollups de Leitura (reading_daily / reading_monthly) ---
+
+_DAILY_ROLLUP_QUERY = """
+    SELECT log_date, SUM(pages_read) AS pages_read, COUNT(*) AS log_count,
+           COUNT(DISTINCT book_id) AS book_count
+    FROM reading_log {where} GROUP BY log_date
+"""
+
+_MONTHLY_ROLLUP_QUERY = f"""
+    SELECT {_DAY_TO_MONTH_SQL.format(column='log_date')} AS month, SUM(pages_read) AS pages_read,
+           COUNT(*) AS log_count, COUNT(DISTINCT book_id) AS book_count
+    FROM reading_log {{where}} GROUP BY 1
+"""
+
+def _rebuild_rollups(conn, log_dates=None):
+    """Recalcula os rollups de todo o histórico ou só dos dias (e respectivos meses) informados."""
+    if log_dates is None:
+        conn.execute("DELETE FROM reading_daily")
+        conn.execute("INSERT INTO reading_daily (log_date, pages_read, log_count, book_count) " + _DAILY_ROLLUP_QUERY.format(where=""))
+        conn.execute("DELETE FROM reading_monthly")
+        conn.execute("INSERT INTO reading_monthly (month, pages_read, log_count, book_count) " + _MONTHLY_ROLLUP_QUERY.format(where=""))
+        return
+
+    days = sorted(set(log_dates))
+    days_json = json.dumps(days)
+    conn.execute("DELETE FROM reading_daily WHERE log_date IN (SELECT value FROM json_each(?))", (days_json,))
+    conn.execute("INSERT INTO reading_daily (log_date, pages_read, log_count, book_count) "
+                 + _DAILY_ROLLUP_QUERY.format(where="WHERE log_date IN (SELECT value FROM json_each(?))"), (days_json,))
+    for month in sorted({from_day_number(day).strftime('%Y-%m') for day in days}):
+        conn.execute("DELETE FROM reading_monthly WHERE month = ?", (month,))
+        conn.execute("INSERT INTO reading_monthly (month, pages_read, log_count, book_count) "
+                     + _MONTHLY_ROLLUP_QUERY.format(where="WHERE log_date BETWEEN ? AND ?"), _month_day_range(month))
+
+def check_rollups():
+    """Retorna as chaves (dia ou mês) cujos rollups divergem do reading_log (vazio = consistente)."""
+    conn = connect_db()
+    daily_query = _DAILY_ROLLUP_QUERY.format(where="")
+    monthly_query = _MONTHLY_ROLLUP_QUERY.format(where="")
+    # Operadores compostos do SQLite associam à esquerda: cada EXCEPT fica em sua subconsulta
+    return pd.read_sql_query(f"""
+        SELECT 'daily' AS rollup, 'stored' AS source, * FROM (SELECT * FROM reading_daily EXCEPT {daily_query})
+        UNION ALL
+        SELECT 'daily', 'expected', * FROM ({daily_query} EXCEPT SELECT * FROM reading_daily)
+        UNION ALL
+        SELECT 'monthly', 'stored', * FROM (SELECT * FROM reading_monthly EXCEPT {monthly_query})
+        UNION ALL
+        SELECT 'monthly', 'expected', * FROM ({monthly_query} EXCEPT SELECT * FROM reading_monthly)
+    """, conn).rename(columns={'log_date': 'period'})
+
+def rebuild_rollups():
+    """Recalcula os rollups diários e mensais a partir do reading_log."""
+    conn = connect_db()
+    with conn:
+        _rebuild_rollups(conn)
+        _bump_data_version(conn)
+
+# --- Fila de Escrita em Segundo Plano (write-behind) ---
+# Opcional (TAZ_WRITE_BEHIND=1): os registros de leitura vão para uma fila limitada e uma
+# única thread por banco grava vários de uma vez, em uma transação (um commit/fsync por
+# lote em vez de um por registro, e sem sessões disputando o lock de escrita). Cada envio
+# retorna um Future resolvido após o commit do lote, com o id do registro gravado.
+
+WRITE_BEHIND = os.environ.get("TAZ_WRITE_BEHIND") == "1"
+WRITE_QUEUE_MAX_SIZE = 10000   # Envios bloqueiam quando a fila está cheia (contrapressão)
+WRITE_BATCH_MAX_ROWS = 500
+WRITE_BATCH_WINDOW = 0.02      # s esperando mais registros antes de gravar o lote
+
+class LogWriteQueue:
+    """Fila de registros de leitura gravados em lote por uma thread dedicada."""
+
+    def __init__(self, db_name, max_size=WRITE_QUEUE_MAX_SIZE, batch_rows=WRITE_BATCH_MAX_ROWS,
+                 batch_window=WRITE_BATCH_WINDOW):
+        self.db_name = db_name
+        self.batch_rows = batch_rows
+        self.batch_window = batch_window
+        self._queue = queue.Queue(maxsize=max_size)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"log-writer:{db_name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, book_id, log_date, pages_read, notes=None, timeout=None):
+        """Enfileira um registro; retorna um Future com o id gravado (ou a exceção do INSERT)."""
+        if self._closed:
+            raise RuntimeError("A fila de escrita já foi encerrada")
+        future = Future()
+        row = (book_id, to_day_number(log_date), pages_read, notes)
+        self._queue.put((row, future), timeout=timeout)
+        return future
+
+    def flush(self, timeout=None):
+        """Espera até que tudo o que foi enviado antes da chamada esteja gravado."""
+        marker = Future()
+        self._queue.put((None, marker), timeout=timeout)
+        marker.result(timeout)
+
+    def close(self, timeout=None):
+        """Grava o que estiver na fila e encerra a thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put((None, None))
+        self._thread.join(timeout)
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_rows and batch[-1][0] is not None:
+            try:
+                batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = _open_connection(self.db_name)
+        # O Future só é resolvido com o lote no disco: o fsync completo é pago uma vez por lote
+        conn.execute("PRAGMA synchronous = FULL")
+        try:
+            while True:
+                batch = self._next_batch()
+                entries = [(row, future) for row, future in batch if row is not None]
+                if entries:
+                    self._write(conn, entries)
+                for row, future in batch:
+                    if row is None and future is not None:
+                        future.set_result(None) # Marcador de flush
+                if batch[-1] == (None, None):
+                    return
+        finally:
+            conn.close()
+
+    def _write(self, conn, entries):
+        insert = "INSERT INTO reading_log (book_id, log_date, pages_read, notes) VALUES (?, ?, ?, ?)"
+        try:
+            with conn:
+                ids = [conn.execute(insert, row).lastrowid for row, _ in entries]
+                _bump_data_version(conn)
+        except Exception as e:
+            if len(entries) == 1:
+                entries[0][1].set_exception(e)
+            else:
+                # Um registro inválido (ex.: livro apagado) não derruba o lote: grava um a um
+                for entry in entries:
+                    self._write(conn, [entry])
+            return
+        for (_, future), log_id in zip(entries, ids):
+            future.set_result(log_id)
+
+_write_queues = {}
+_write_queues_lock = threading.Lock()
+
+def get_log_write_queue():
+    """Fila de escrita do banco atual, criada (com sua thread) no primeiro uso."""
+    with _write_queues_lock:
+        db_name = get_db_name()
+        write_queue = _write_queues.get(db_name)
+        if write_queue is None:
+            write_queue = _write_queues[db_name] = LogWriteQueue(db_name)
+        return write_queue
+
+def submit_log_entry(book_id, log_date, pages_read, notes=None):
+    """Registra uma leitura pela fila (se WRITE_BEHIND) ou direto; retorna um Future.
+
+    Sem write-behind o registro é gravado na hora e o Future já vem resolvido.
+    """
+    if WRITE_BEHIND:
+        return get_log_write_queue().submit(book_id, log_date, pages_read, notes)
+    future = Future()
+    try:
+        future.set_result(add_log_entry(book_id, log_date, pages_read, notes))
+    except sqlite3.Error as e:
+        future.set_exception(e)
+    return future
+
+def wait_for_writes(futures, timeout=None):
+    """Espera os envios da sessão (leia-suas-escritas); retorna os que ainda não terminaram."""
+    _, not_done = wait(futures, timeout=timeout)
+    return [future for future in futures if future in not_done]
+
+@atexit.register
+def close_write_queues():
+    """Grava o que estiver pendente nas filas antes de o processo terminar."""
+    with _write_queues_lock:
+        write_queues = list(_write_queues.values())
+        _write_queues.clear()
+    for write_queue in write_queues:
+        write_queue.close()
+
+# --- Colunas do Log para Análise em Memória (ver logstore.py) ---
+# As datas já são dias desde 1970-01-01: as colunas vão do cursor direto para os arrays
+
+LOG_COLUMNS_CHUNK_SIZE = 100000
+
+def fetch_log_columns(after_id=0, chunk_size=LOG_COLUMNS_CHUNK_SIZE):
+    """Registros com id > after_id como arrays NumPy (id, dia, book_id, páginas), ordenados por id.
+
+    Lidos em blocos por um cursor de tuplas, sem passar por DataFrames.
+    """
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute("""
+        SELECT id, log_date, book_id, pages_read
+        FROM reading_log WHERE id > ? ORDER BY id
+    """, (after_id,))
+    chunks = [np.array(rows, dtype=np.int64).reshape(-1, 4) for rows in _iter_fetchmany(cursor, chunk_size)]
+    data = np.concatenate(chunks) if chunks else np.empty((0, 4), dtype=np.int64)
+    return (data[:, 0], data[:, 1].astype(np.int32), data[:, 2].astype(np.int32), data[:, 3].astype(np.int32))
+
+def fetch_daily_rollup_columns():
+    """Rollup diário como arrays NumPy (dia, páginas, registros), ordenados por dia."""
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    rows = cursor.execute("""
+        SELECT log_date, pages_read, log_count
+        FROM reading_daily ORDER BY log_date
+    """).fetchall()
+    data = np.array(rows, dtype=np.int64).reshape(-1, 3)
+    return data[:, 0], data[:, 1], data[:, 2]
+
+# --- Dados para Recomendações (ver recommendations.py) ---
+
+def fetch_recommendation_books():
+    """Livros com o necessário para o índice de recomendações, ordenados por id.
+
+    end_date e last_log_date ficam em dias desde 1970-01-01 (sem conversão), para o
+    cálculo vetorizado da recência.
+    """
+    conn = connect_db()
+    return pd.read_sql_query("""
+        SELECT id, title, author, genre, status, total_pages, pages_read_total, end_date, last_log_date
+        FROM books ORDER BY id
+    """, conn)
+
+def count_log_entries_after(after_id=0):
+    """(registros, maior id) do reading_log com id > after_id, pelo rowid (sem varrer o resto)."""
+    conn = connect_db()
+    count, max_id = conn.execute("SELECT COUNT(*), MAX(id) FROM reading_log WHERE id > ?", (after_id,)).fetchone()
+    return count, max_id if max_id is not None else after_id
+
+def iter_log_notes(after_id=0, up_to_id=None, chunk_size=LOG_COLUMNS_CHUNK_SIZE):
+    """Notas não vazias dos registros com after_id < id <= up_to_id, em blocos de (book_id, notes)."""
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute("""
+        SELECT book_id, notes FROM reading_log
+        WHERE id > ? AND id <= COALESCE(?, id) AND notes IS NOT NULL AND notes <> '' ORDER BY id
+    """, (after_id, up_to_id))
+    yield from _iter_fetchmany(cursor, chunk_size)
+
+# --- Diagnóstico ---
+
+def explain_query_plan(sql, params=None):
+    """Plano de execução (EXPLAIN QUERY PLAN) de uma consulta; a consulta não é executada."""
+    conn = connect_db()
+    return pd.read_sql_query("EXPLAIN QUERY PLAN " + sql, conn, params=params)
+
+def get_database_file_info():
+    """Caminho e tamanho (bytes) do banco e dos arquivos -wal/-shm, e contagem de páginas."""
+    conn = connect_db()
+    db_name = get_db_name()
+    sizes = {suffix: os.path.getsize(db_name + suffix) if os.path.exists(db_name + suffix) else 0
+             for suffix in ('', '-wal', '-shm')}
+    return {
+        'path': os.path.abspath(db_name),
+        'db_bytes': sizes[''],
+        'wal_bytes': sizes['-wal'],
+        'shm_bytes': sizes['-shm'],
+        'page_size': conn.execute("PRAGMA page_size").fetchone()[0],
+        'page_count': conn.execute("PRAGMA page_count").fetchone()[0],
+        'freelist_count': conn.execute("PRAGMA freelist_count").fetchone()[0],
+        'schema_version': get_schema_version(conn),
+    }
+
 # --- Inicialização ---
-# Cria as tabelas na primeira vez que o módulo é importado
+# Cria/atualiza o esquema na primeira vez que o módulo é importado
 create_tables()
\ No newline at end of file
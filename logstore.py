@@ -0,0 +1,150 @@
+"""Cópia colunar do reading_log em arrays NumPy para as agregações do dashboard.
+
+O log é carregado uma vez por processo (e por banco) em arrays compactos, ordenados
+por dia: dia (int32, dias desde 1970-01-01), book_id (int32) e páginas (int32), 12
+bytes por registro. Depois de cada escrita (data_version mudou) só os registros novos
+(id > último id carregado) são acrescentados. Como exclusões e edições não aparecem
+nesse caminho, o resultado é conferido com o rollup diário (páginas e registros por
+dia) e, se divergir, o log é recarregado por inteiro. Trocar só o livro de um registro
+não altera o rollup diário; isso só afeta pages_by_book até a próxima recarga.
+
+As agregações recortam o período, os meses e os anos com searchsorted (os arrays estão
+ordenados por dia) e somam com reduceat/bincount.
+"""
+import threading
+import numpy as np
+import pandas as pd
+import database as db
+
+_EMPTY_COLUMNS = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32))
+
+class LogStore:
+    """Arrays do reading_log de um banco, atualizados incrementalmente."""
+
+    def __init__(self):
+        # (dias, livros, páginas) trocados juntos, para uma leitura nunca ver arrays de versões diferentes
+        self.columns = _EMPTY_COLUMNS
+        self.last_id = 0
+        self.data_version = None
+        self.full_reloads = 0
+
+    # --- Carga ---
+
+    def _append(self, ids, days, book_ids, pages, base=None):
+        current_days, current_books, current_pages = self.columns if base is None else base
+        if len(ids) == 0:
+            self.columns = (current_days, current_books, current_pages)
+            return
+        order = np.argsort(days, kind='stable')
+        all_days = np.concatenate([current_days, days[order]])
+        all_books = np.concatenate([current_books, book_ids[order]])
+        all_pages = np.concatenate([current_pages, pages[order]])
+        if len(current_days) and days.min() < current_days[-1]:
+            # Registro com data retroativa: reordena tudo (a ordenação estável preserva o resto)
+            order = np.argsort(all_days, kind='stable')
+            all_days, all_books, all_pages = all_days[order], all_books[order], all_pages[order]
+        self.columns = (all_days, all_books, all_pages)
+        self.last_id = int(ids.max())
+
+    def reload(self):
+        self._append(*db.fetch_log_columns(), base=_EMPTY_COLUMNS)
+        self.full_reloads += 1
+
+    def matches_rollup(self):
+        """Confere páginas e registros por dia com o rollup diário (O(n), sem ordenar)."""
+        rollup_days, rollup_pages, rollup_counts = db.fetch_daily_rollup_columns()
+        days, _, pages = self.columns
+        if len(days) == 0:
+            return len(rollup_days) == 0
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        return (np.array_equal(days[starts], rollup_days)
+                and np.array_equal(np.add.reduceat(pages, starts, dtype=np.int64), rollup_pages)
+                and np.array_equal(np.diff(np.r_[starts, len(days)]), rollup_counts))
+
+    def refresh(self):
+        """Aplica as escritas feitas desde a última atualização."""
+        version = db.get_data_version()
+        if version == self.data_version:
+            return
+        if self.data_version is None:
+            self.reload()
+        else:
+            self._append(*db.fetch_log_columns(after_id=self.last_id))
+            if not self.matches_rollup():
+                self.reload()
+        self.data_version = version
+
+    # --- Agregações ---
+
+    def _select(self, start_date=None, end_date=None):
+        """(dias, livros, páginas) do período, recortados por searchsorted (arrays ordenados por dia)."""
+        days, book_ids, pages = self.columns
+        lo = np.searchsorted(days, db.to_day_number(start_date), 'left') if start_date else 0
+        hi = np.searchsorted(days, db.to_day_number(end_date), 'right') if end_date else len(days)
+        return days[lo:hi], book_ids[lo:hi], pages[lo:hi]
+
+    def summary(self, start_date=None, end_date=None):
+        """Páginas, registros e dias com leitura no período."""
+        days, _, pages = self._select(start_date, end_date)
+        return {
+            'pages_read': int(pages.sum(dtype=np.int64)),
+            'log_count': len(days),
+            'reading_days': int(np.count_nonzero(days[1:] != days[:-1]) + 1) if len(days) else 0,
+        }
+
+    def pages_by_month(self, start_date=None, end_date=None):
+        """Páginas por mês do período: year, month, pages_read (só meses com leitura)."""
+        days, _, pages = self._select(start_date, end_date)
+        if len(days) == 0:
+            return pd.DataFrame({'year': [], 'month': [], 'pages_read': []}, dtype='int64')
+        # Os dias estão ordenados: cada mês é um trecho contíguo, somado com reduceat
+        first_month, last_month = days[[0, -1]].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        months = np.arange(first_month, last_month + 1)
+        bounds = np.searchsorted(days, months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64))
+        present = bounds < np.r_[bounds[1:], len(days)]
+        totals = np.add.reduceat(pages, bounds[present], dtype=np.int64)
+        return pd.DataFrame({'year': months[present] // 12 + 1970, 'month': months[present] % 12 + 1,
+                             'pages_read': totals})
+
+    def daily_breakdown(self, start_date=None, end_date=None):
+        """Agrupado por (ano, dia da semana; 0 = segunda): páginas, registros e dias com leitura."""
+        days, _, pages = self._select(start_date, end_date)
+        if len(days) == 0:
+            return pd.DataFrame({'year': [], 'weekday': [], 'pages_read': [], 'log_count': [],
+                                 'reading_days': []}, dtype='int64')
+        first_year, last_year = days[[0, -1]].astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+        year_starts = (np.arange(first_year, last_year + 1) - 1970).astype('datetime64[Y]').astype('datetime64[D]')
+        bounds = np.searchsorted(days, year_starts.astype(np.int64))
+        # Ano de cada registro pela posição nos trechos de cada ano (arrays ordenados por dia)
+        year_index = np.repeat(np.arange(len(bounds)), np.diff(np.r_[bounds, len(days)]))
+        # 01/01/1970 foi uma quinta-feira (3 com segunda = 0)
+        keys = year_index * 7 + (days + 3) % 7
+        new_day = np.r_[True, days[1:] != days[:-1]]
+        log_count = np.bincount(keys)
+        index = np.flatnonzero(log_count)
+        return pd.DataFrame({
+            'year': index // 7 + first_year,
+            'weekday': index % 7,
+            'pages_read': np.bincount(keys, weights=pages).astype(np.int64)[index],
+            'log_count': log_count[index],
+            'reading_days': np.bincount(keys[new_day], minlength=len(log_count))[index],
+        })
+
+    def pages_by_book(self, start_date=None, end_date=None):
+        """Páginas por livro no período: book_id, pages_read (só livros com leitura)."""
+        _, book_ids, pages = self._select(start_date, end_date)
+        totals = np.bincount(book_ids, weights=pages).astype(np.int64)
+        present = np.flatnonzero(np.bincount(book_ids))
+        return pd.DataFrame({'book_id': present, 'pages_read': totals[present]})
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_log_store():
+    """LogStore do banco atual, atualizado com as escritas mais recentes."""
+    with _stores_lock:
+        store = _stores.get(db.get_db_name())
+        if store is None:
+            store = _stores[db.get_db_name()] = LogStore()
+        store.refresh()
+        return store
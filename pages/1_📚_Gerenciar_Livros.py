@@ -1,9 +1,13 @@
 import streamlit as st
 import database as db
+import profiling
+import tenancy
 import pandas as pd
 from datetime import datetime, date
 
 st.set_page_config(page_title="Gerenciar Livros", page_icon="📚")
+profiling.begin_run("Gerenciar Livros")
+tenancy.select_tenant()
 st.title("📚 Gerenciar Livros")
 
 # --- Formulário para Adicionar/Editar Livro ---
@@ -43,6 +47,8 @@ with st.form("add_book_form", clear_on_submit=True):
 
 st.markdown("---")
 
+profiling.checkpoint("adicionar livro")
+
 # --- Lista de Livros Cadastrados ---
 st.header("Livros Cadastrados")
 
@@ -65,9 +71,17 @@ else:
 
     # --- Opções de Edição e Deleção ---
     st.header("Editar ou Deletar Livro")
-    book_list = books_df['title'].tolist()
     book_id_map = dict(zip(books_df['title'], books_df['id'])) # Mapa de título para ID
 
+    # Filtra a lista pelo índice de busca (título, autor ou gênero) em vez de listar todos os livros
+    filtro_livros = st.text_input("Buscar livro (título, autor ou gênero):", key="filter_action")
+    if filtro_livros.strip():
+        book_list = db.search_books(filtro_livros, limit=50)['title'].tolist()
+        if not book_list:
+            st.info("Nenhum livro encontrado para a busca.")
+    else:
+        book_list = books_df['title'].tolist()
+
     selected_title_for_action = st.selectbox("Selecione um livro para editar ou deletar:", options=[""] + book_list, key="select_action")
 
     if selected_title_for_action:
@@ -136,4 +150,6 @@ else:
                     st.session_state['select_action'] = ""
                     st.rerun() # Força o recarregamento
                 except Exception as e:
-                    st.error(f"Erro ao deletar livro: {e}")
\ No newline at end of file
+                    st.error(f"Erro ao deletar livro: {e}")
+
+profiling.checkpoint("livros cadastrados")
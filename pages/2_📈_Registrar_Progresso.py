@@ -1,28 +1,44 @@
 import streamlit as st
 import database as db
-import pandas as pd
+import profiling
+import tenancy
 from datetime import datetime
 
 st.set_page_config(page_title="Registrar Progresso", page_icon="📈")
+profiling.begin_run("Registrar Progresso")
+tenancy.select_tenant()
 st.title("📈 Registrar Progresso de Leitura")
 
+# Registros enviados pela fila de escrita cuja confirmação ainda não chegou
+WRITE_ACK_TIMEOUT = 2 # s
+if 'pending_log_writes' not in st.session_state:
+    st.session_state.pending_log_writes = []
+
 # Selecionar Livro em Andamento
 livros_lendo_df = db.get_books_by_status('lendo')
 
 if livros_lendo_df.empty:
     st.warning("Nenhum livro marcado como 'lendo'. Adicione ou atualize o status de um livro em 'Gerenciar Livros'.")
 else:
+    # Progresso de todos os livros em andamento em uma única consulta, unido pelo ID
+    progresso_df = db.get_progress_for_books(status='lendo')
+    livros_lendo_df = livros_lendo_df.merge(progresso_df, left_on='id', right_on='book_id', how='left')
+    livros_lendo_df['pages_read'] = livros_lendo_df['pages_read'].fillna(0).astype(int)
+    livros_lendo_df['progress_pct'] = livros_lendo_df['progress_pct'].fillna(0.0)
+
     livros_lendo_dict = dict(zip(livros_lendo_df['id'], livros_lendo_df['title']))
+    paginas_lidas_dict = dict(zip(livros_lendo_df['id'], livros_lendo_df['pages_read']))
+    progresso_dict = dict(zip(livros_lendo_df['id'], livros_lendo_df['progress_pct']))
     selected_book_id = st.selectbox(
         "Selecione o livro que você leu:",
         options=list(livros_lendo_dict.keys()),
-        format_func=lambda x: livros_lendo_dict[x] # Mostra o título no selectbox
+        format_func=lambda x: f"{livros_lendo_dict[x]} ({progresso_dict[x]:.0f}%)" # Mostra o título e o progresso no selectbox
     )
 
     if selected_book_id:
         book_details = db.get_book_by_id(selected_book_id)
         total_pages = book_details['total_pages']
-        pages_read_so_far = db.get_pages_read_for_book(selected_book_id)
+        pages_read_so_far = paginas_lidas_dict[selected_book_id]
         pages_remaining = total_pages - pages_read_so_far
 
         st.info(f"**{livros_lendo_dict[selected_book_id]}**: {pages_read_so_far} de {total_pages} páginas lidas ({pages_remaining} restantes).")
@@ -39,25 +55,52 @@ else:
                     st.error("Por favor, insira um número válido de páginas lidas.")
                 else:
                     try:
-                        db.add_log_entry(selected_book_id, log_date, pages_read_today, notes)
-                        st.success(f"{pages_read_today} páginas registradas para '{livros_lendo_dict[selected_book_id]}' em {log_date.strftime('%d/%m/%Y')}.")
-                        # Opcional: Verificar se o livro foi concluído
-                        if pages_read_so_far + pages_read_today >= total_pages:
-                            st.balloons()
-                            st.info(f"Parabéns! Você terminou '{livros_lendo_dict[selected_book_id]}'! Não se esqueça de atualizar o status para 'concluído' em 'Gerenciar Livros'.")
+                        # Com write-behind, o registro é gravado em lote pela fila; a espera é
+                        # só pela confirmação deste registro (e, se demorar, fica pendente na sessão)
+                        envio = db.submit_log_entry(selected_book_id, log_date, pages_read_today, notes)
+                        if db.wait_for_writes([envio], timeout=WRITE_ACK_TIMEOUT):
+                            # Ainda na fila: só foi enviado, e pode falhar ao ser gravado
+                            st.session_state.pending_log_writes.append(envio)
+                            st.info(f"Registro de {pages_read_today} páginas para '{livros_lendo_dict[selected_book_id]}' enviado; a gravação ainda está pendente.")
+                        else:
+                            envio.result() # Repassa o erro do INSERT, se houver
+                            st.success(f"{pages_read_today} páginas registradas para '{livros_lendo_dict[selected_book_id]}' em {log_date.strftime('%d/%m/%Y')}.")
+                            # Opcional: Verificar se o livro foi concluído
+                            if pages_read_so_far + pages_read_today >= total_pages:
+                                st.balloons()
+                                st.info(f"Parabéns! Você terminou '{livros_lendo_dict[selected_book_id]}'! Não se esqueça de atualizar o status para 'concluído' em 'Gerenciar Livros'.")
                     except Exception as e:
                         st.error(f"Erro ao registrar leitura: {e}")
 
 st.markdown("---")
 
+profiling.checkpoint("registrar progresso")
+
 # --- Histórico de Leitura ---
 st.header("Histórico Recente de Leitura")
 
+# Leia-suas-escritas: o histórico só é lido depois de gravados os registros desta sessão
+if st.session_state.pending_log_writes:
+    pendentes = db.wait_for_writes(st.session_state.pending_log_writes, timeout=WRITE_ACK_TIMEOUT)
+    for envio in st.session_state.pending_log_writes:
+        if envio.done() and envio.exception() is not None:
+            st.error(f"Erro ao gravar um registro de leitura: {envio.exception()}")
+    st.session_state.pending_log_writes = pendentes
+    if st.session_state.pending_log_writes:
+        st.info(f"{len(st.session_state.pending_log_writes)} registro(s) ainda sendo gravado(s).")
+
 # Filtros (opcional)
 show_all = st.checkbox("Mostrar todo o histórico?")
-num_recent = st.slider("Número de registros recentes a exibir:", 5, 50, 10, disabled=show_all)
+num_recent = st.slider("Número de registros a exibir (por página no histórico completo):", 5, 50, 10)
 
-log_df = db.get_reading_log() # Pega todos os logs
+# Cursores keyset do início de cada página já visitada; reinicia se o tamanho da página mudar
+if st.session_state.get('log_page_size') != num_recent or not show_all:
+    st.session_state.log_page_size = num_recent
+    st.session_state.log_page_cursors = [None]
+page_cursors = st.session_state.log_page_cursors
+
+# Busca só os registros exibidos (e a contagem total), não o histórico inteiro
+log_df, total_logs, next_cursor = db.get_reading_log_page(num_recent, after=page_cursors[-1])
 
 if log_df.empty:
     st.info("Nenhum registro de leitura encontrado.")
@@ -67,7 +110,23 @@ else:
     log_df_display = log_df_display[['log_date', 'book_title', 'pages_read', 'notes']] # Seleciona e reordena
     log_df_display.columns = ['Data', 'Livro', 'Páginas Lidas', 'Anotações']
 
+    st.dataframe(log_df_display, hide_index=True, use_container_width=True)
+
     if show_all:
-        st.dataframe(log_df_display, hide_index=True, use_container_width=True)
+        page_number = len(page_cursors)
+        total_pages = max(-(-total_logs // num_recent), 1) # Divisão com arredondamento para cima
+        col_prev, col_info, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if st.button("← Anteriores", disabled=page_number == 1):
+                page_cursors.pop()
+                st.rerun()
+        with col_info:
+            st.caption(f"Página {page_number} de {total_pages} ({total_logs} registros)")
+        with col_next:
+            if st.button("Próximos →", disabled=next_cursor is None):
+                page_cursors.append(next_cursor)
+                st.rerun()
     else:
-        st.dataframe(log_df_display.head(num_recent), hide_index=True, use_container_width=True)
\ No newline at end of file
+        st.caption(f"Exibindo {len(log_df)} de {total_logs} registros.")
+
+profiling.checkpoint("histórico")
@@ -1,10 +1,14 @@
 import streamlit as st
 import database as db
-import pandas as pd
-import plotly.express as px
+import profiling
+import tenancy
+import stats
+import timeseries
 from datetime import datetime
 
 st.set_page_config(page_title="Metas e Estatísticas", page_icon="🎯")
+profiling.begin_run("Metas e Estatísticas")
+tenancy.select_tenant()
 st.title("🎯 Metas de Leitura e Estatísticas Detalhadas")
 
 # --- Definição de Metas (Simples, usando session_state para persistir na sessão) ---
@@ -42,32 +46,16 @@ with col_meta2:
         st.session_state.goal_pages_day = goal_pages_day_input
         st.rerun()
 
+profiling.checkpoint("definir metas")
+
 # --- Acompanhamento de Metas ---
 st.header("Acompanhamento das Metas")
 
-# Carregar dados necessários
-all_books_df = db.get_all_books()
-all_logs_df = db.get_reading_log()
+# Calcular progresso (mesmas métricas do dashboard, memorizadas por versão dos dados)
 current_year = datetime.now().year
-
-# Calcular progresso
-books_df_copy = all_books_df.copy()
-books_df_copy['end_date'] = pd.to_datetime(books_df_copy['end_date'], errors='coerce')
-livros_concluidos_ano = len(books_df_copy[
-    (books_df_copy['status'] == 'concluído') &
-    (books_df_copy['end_date'].dt.year == current_year)
-])
-
-paginas_lidas_ano = 0
-media_paginas_dia = 0
-if not all_logs_df.empty:
-    logs_df_copy = all_logs_df.copy()
-    logs_df_copy['log_date'] = pd.to_datetime(logs_df_copy['log_date'])
-    logs_ano = logs_df_copy[logs_df_copy['log_date'].dt.year == current_year]
-    if not logs_ano.empty:
-        paginas_lidas_ano = logs_ano['pages_read'].sum()
-        dias_com_leitura = logs_ano['log_date'].dt.date.nunique()
-        media_paginas_dia = paginas_lidas_ano / dias_com_leitura if dias_com_leitura > 0 else 0
+stats_ano = stats.compute_stats(current_year)['per_year'].loc[current_year]
+livros_concluidos_ano = int(stats_ano['books_finished'])
+media_paginas_dia = stats_ano['avg_pages_per_day']
 
 col_prog1, col_prog2 = st.columns(2)
 
@@ -96,80 +84,116 @@ with col_prog2:
 
 st.markdown("---")
 
+profiling.checkpoint("acompanhamento das metas")
+
 # --- Estatísticas Detalhadas ---
 st.header("Estatísticas Detalhadas")
 
+# Intervalo de anos das estatísticas detalhadas (padrão: até os últimos 5 anos)
+anos_disponiveis = stats.available_years()
+ano_inicio, ano_fim = st.select_slider(
+    "Período (anos):",
+    options=anos_disponiveis,
+    value=(max(anos_disponiveis[0], current_year - 4), anos_disponiveis[-1]),
+) if len(anos_disponiveis) > 1 else (current_year, current_year)
+stats_periodo = stats.compute_stats(ano_inicio, ano_fim)
+
+resumo_anos = stats_periodo['per_year'].reset_index()
+st.dataframe(
+    resumo_anos.rename(columns={
+        'year': 'Ano', 'books_finished': 'Livros Concluídos', 'pages_read': 'Páginas Lidas',
+        'log_count': 'Registros', 'reading_days': 'Dias com Leitura', 'avg_pages_per_day': 'Média Pág/Dia'
+    }).round({'Média Pág/Dia': 1}),
+    hide_index=True, use_container_width=True
+)
+
+profiling.checkpoint("resumo por ano")
+
 # Gráfico: Páginas lidas ao longo do tempo (acumulado)
-if not all_logs_df.empty:
-    logs_df_copy = all_logs_df.sort_values('log_date').copy()
-    logs_df_copy['log_date'] = pd.to_datetime(logs_df_copy['log_date'])
-    logs_df_copy['cumulative_pages'] = logs_df_copy['pages_read'].cumsum()
-    fig_acumulado = px.line(logs_df_copy, x='log_date', y='cumulative_pages',
-                           title="Total de Páginas Lidas (Acumulado)",
-                           labels={'log_date': 'Data', 'cumulative_pages': 'Total de Páginas Acumuladas'})
+# Agregado no SQLite e reduzido a no máximo timeseries.MAX_CHART_POINTS pontos (LTTB),
+# então o tamanho do gráfico não cresce com o histórico
+limites_leitura = db.get_reading_date_bounds()
+if limites_leitura:
+    RESOLUCOES = {'auto': 'Automática', 'day': 'Dia', 'week': 'Semana', 'month': 'Mês'}
+    col_periodo, col_resolucao = st.columns([3, 1])
+    with col_periodo:
+        periodo_grafico = st.date_input(
+            "Intervalo do gráfico acumulado:",
+            value=limites_leitura,
+            min_value=limites_leitura[0],
+            max_value=limites_leitura[1],
+            format="DD/MM/YYYY",
+            key="cumulative_chart_range"
+        )
+    with col_resolucao:
+        resolucao = st.selectbox("Resolução:", options=list(RESOLUCOES), format_func=RESOLUCOES.get,
+                                 key="cumulative_chart_resolution")
+
+    # Enquanto o usuário escolhe o intervalo, date_input devolve só a data inicial
+    inicio_grafico = periodo_grafico[0] if len(periodo_grafico) > 0 else None
+    fim_grafico = periodo_grafico[1] if len(periodo_grafico) > 1 else None
+    acumulado_df, resolucao_usada = timeseries.cumulative_pages(inicio_grafico, fim_grafico, resolucao)
+
+    import plotly.express as px # Só quando há gráfico: o plotly leva centenas de ms para importar
+    fig_acumulado = px.line(acumulado_df, x='period', y='cumulative_pages',
+                           title=f"Total de Páginas Lidas (Acumulado, por {RESOLUCOES[resolucao_usada].lower()})",
+                           labels={'period': 'Data', 'cumulative_pages': 'Total de Páginas Acumuladas'})
     st.plotly_chart(fig_acumulado, use_container_width=True)
 else:
     st.info("Nenhum registro de leitura para exibir gráfico acumulado.")
 
+profiling.checkpoint("gráfico acumulado")
 
-# Gráfico: Leitura por Dia da Semana
-if not all_logs_df.empty:
-    logs_df_copy = all_logs_df.copy()
-    logs_df_copy['log_date'] = pd.to_datetime(logs_df_copy['log_date'])
-    logs_df_copy['weekday'] = logs_df_copy['log_date'].dt.day_name(locale='pt_BR.utf8') # Necessário locale pt_BR instalado no sistema ou usar dt.weekday e mapear
-    pages_per_weekday = logs_df_copy.groupby('weekday')['pages_read'].sum().reset_index()
-
-    # Ordenar os dias da semana corretamente
-    dias_ordem = ["Segunda-feira", "Terça-feira", "Quarta-feira", "Quinta-feira", "Sexta-feira", "Sábado", "Domingo"]
-    try:
-        pages_per_weekday['weekday'] = pd.Categorical(pages_per_weekday['weekday'], categories=dias_ordem, ordered=True)
-        pages_per_weekday = pages_per_weekday.sort_values('weekday')
-
-        fig_weekday = px.bar(pages_per_weekday, x='weekday', y='pages_read',
-                            title="Total de Páginas Lidas por Dia da Semana",
-                            labels={'weekday': 'Dia da Semana', 'pages_read': 'Total de Páginas'})
-        st.plotly_chart(fig_weekday, use_container_width=True)
-    except Exception as e:
-        st.warning(f"Não foi possível gerar gráfico por dia da semana (verifique o locale pt_BR): {e}")
-        # Fallback para ordem padrão se locale falhar
-        pages_per_weekday = logs_df_copy.groupby(logs_df_copy['log_date'].dt.weekday)['pages_read'].sum().reset_index()
-        weekday_map = {0: 'Seg', 1: 'Ter', 2: 'Qua', 3: 'Qui', 4: 'Sex', 5: 'Sáb', 6: 'Dom'}
-        pages_per_weekday['weekday_name'] = pages_per_weekday['log_date'].map(weekday_map)
-        fig_weekday_fallback = px.bar(pages_per_weekday, x='weekday_name', y='pages_read', title="Páginas por Dia da Semana (Fallback)")
-        st.plotly_chart(fig_weekday_fallback, use_container_width=True)
+# Gráfico: Leitura por Dia da Semana no período (sem depender do locale do sistema)
+pages_per_weekday = stats_periodo['pages_per_weekday']
+if pages_per_weekday['reading_days'].sum() > 0:
+    import plotly.express as px
+    fig_weekday = px.bar(pages_per_weekday, x='weekday_name', y='pages_read',
+                        title=f"Total de Páginas Lidas por Dia da Semana ({ano_inicio}–{ano_fim})",
+                        labels={'weekday_name': 'Dia da Semana', 'pages_read': 'Total de Páginas'})
+    st.plotly_chart(fig_weekday, use_container_width=True)
 
+profiling.checkpoint("gráfico por dia da semana")
 
 # Outras estatísticas: Livro mais rápido, mais longo, etc. (exemplo)
-livros_concluidos_df = all_books_df[all_books_df['status'] == 'concluído'].copy()
-if not livros_concluidos_df.empty and 'start_date' in livros_concluidos_df.columns and 'end_date' in livros_concluidos_df.columns:
-    livros_concluidos_df['start_date'] = pd.to_datetime(livros_concluidos_df['start_date'], errors='coerce')
-    livros_concluidos_df['end_date'] = pd.to_datetime(livros_concluidos_df['end_date'], errors='coerce')
-    # Remover linhas onde start ou end date são NaT
-    livros_concluidos_df.dropna(subset=['start_date', 'end_date'], inplace=True)
-
-    if not livros_concluidos_df.empty:
-        livros_concluidos_df['reading_days'] = (livros_concluidos_df['end_date'] - livros_concluidos_df['start_date']).dt.days + 1 # Adiciona 1 para incluir o dia de início
-        # Evitar divisão por zero ou dias negativos
-        livros_concluidos_df = livros_concluidos_df[livros_concluidos_df['reading_days'] > 0]
-
-        if not livros_concluidos_df.empty:
-            livros_concluidos_df['pages_per_day'] = livros_concluidos_df['total_pages'] / livros_concluidos_df['reading_days']
-
-            st.subheader("Desempenho por Livro (Concluídos)")
-            st.dataframe(
-                livros_concluidos_df[['title', 'total_pages', 'reading_days', 'pages_per_day']].rename(columns={
-                    'title': 'Título', 'total_pages': 'Páginas', 'reading_days': 'Dias de Leitura', 'pages_per_day': 'Média Pág/Dia'
-                }).round({'pages_per_day': 1}), # Arredonda média
-                hide_index=True, use_container_width=True
-            )
-
-            mais_rapido = livros_concluidos_df.loc[livros_concluidos_df['pages_per_day'].idxmax()] if not livros_concluidos_df.empty else None
-            mais_longo_tempo = livros_concluidos_df.loc[livros_concluidos_df['reading_days'].idxmax()] if not livros_concluidos_df.empty else None
-
-            col_stat1, col_stat2 = st.columns(2)
-            if mais_rapido is not None:
-                 with col_stat1:
-                     st.metric("Leitura Mais Rápida (Pág/Dia)", f"{mais_rapido['pages_per_day']:.1f}", delta=mais_rapido['title'])
-            if mais_longo_tempo is not None:
-                 with col_stat2:
-                     st.metric("Leitura Mais Longa (Dias)", f"{mais_longo_tempo['reading_days']}", delta=mais_longo_tempo['title'])
\ No newline at end of file
+livros_concluidos_df = db.get_finished_books_performance() # Só concluídos com datas válidas
+
+if not livros_concluidos_df.empty:
+    st.subheader("Desempenho por Livro (Concluídos)")
+    st.dataframe(
+        livros_concluidos_df[['title', 'total_pages', 'reading_days', 'pages_per_day']].rename(columns={
+            'title': 'Título', 'total_pages': 'Páginas', 'reading_days': 'Dias de Leitura', 'pages_per_day': 'Média Pág/Dia'
+        }).round({'pages_per_day': 1}), # Arredonda média
+        hide_index=True, use_container_width=True
+    )
+
+    mais_rapido = livros_concluidos_df.loc[livros_concluidos_df['pages_per_day'].idxmax()]
+    mais_longo_tempo = livros_concluidos_df.loc[livros_concluidos_df['reading_days'].idxmax()]
+
+    col_stat1, col_stat2 = st.columns(2)
+    with col_stat1:
+        st.metric("Leitura Mais Rápida (Pág/Dia)", f"{mais_rapido['pages_per_day']:.1f}", delta=mais_rapido['title'])
+    with col_stat2:
+        st.metric("Leitura Mais Longa (Dias)", f"{mais_longo_tempo['reading_days']}", delta=mais_longo_tempo['title'])
+
+profiling.checkpoint("desempenho por livro")
+
+# --- Grupo de Leitores (somente com multi-tenant) ---
+# Totais de todos os leitores no mesmo período, lidos dos shards via ATTACH
+if db.TENANT_MODE:
+    st.header(f"Grupo de Leitores ({ano_inicio}–{ano_fim})")
+    grupo_df = db.get_group_summary(db.year_range(ano_inicio)[0], db.year_range(ano_fim)[1])
+    if grupo_df.empty:
+        st.info("Nenhum leitor registrado.")
+    else:
+        st.dataframe(
+            grupo_df.sort_values('pages_read', ascending=False).rename(columns={
+                'tenant_id': 'Leitor(a)', 'books_finished': 'Livros Concluídos', 'pages_read': 'Páginas Lidas',
+                'log_count': 'Registros', 'reading_days': 'Dias com Leitura'
+            }),
+            hide_index=True, use_container_width=True
+        )
+        st.caption(f"Total do grupo: {int(grupo_df['pages_read'].sum()):,} páginas e "
+                   f"{int(grupo_df['books_finished'].sum())} livros concluídos.".replace(",", "."))
+
+    profiling.checkpoint("grupo de leitores")
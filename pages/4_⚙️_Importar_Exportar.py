@@ -1,20 +1,25 @@
 import streamlit as st
 import database as db
-import pandas as pd
+import profiling
+import tenancy
 import io
+import tempfile
 
 st.set_page_config(page_title="Importar/Exportar Dados", page_icon="⚙️")
+profiling.begin_run("Importar/Exportar")
+tenancy.select_tenant()
 st.title("⚙️ Importar e Exportar Dados")
 
 # --- Exportar Dados ---
 st.header("Exportar Dados")
 
-export_format = st.selectbox("Selecione o formato para exportar:", ["Excel (.xlsx)", "CSV (.csv)"])
+export_format = st.selectbox("Selecione o formato para exportar:", ["Excel (.xlsx)", "CSV (.csv)", "Parquet (.parquet)"])
 export_data_type = st.selectbox("Selecione os dados para exportar:", ["Livros", "Histórico de Leitura", "Ambos"])
 
 if st.button("Exportar Dados"):
     try:
         if export_format == "Excel (.xlsx)":
+            import pandas as pd # pandas/openpyxl só quando exportar para Excel
             output = io.BytesIO()
             with pd.ExcelWriter(output, engine='openpyxl') as writer:
                 if export_data_type in ["Livros", "Ambos"]:
@@ -41,36 +46,58 @@ if st.button("Exportar Dados"):
             st.success("Dados prontos para download!")
 
         elif export_format == "CSV (.csv)":
+            # Linhas vão do cursor para um arquivo temporário em blocos (memória limitada ao bloco)
+            export_file = tempfile.TemporaryFile()
             if export_data_type == "Livros":
-                books_df = db.get_all_books()
-                for col in ['start_date', 'end_date']:
-                     if col in books_df.columns: books_df[col] = books_df[col].astype(str)
-                csv_data = books_df.to_csv(index=False).encode('utf-8')
+                db.export_table_csv('books', export_file)
                 file_name = "livros_export.csv"
                 mime_type = "text/csv"
 
             elif export_data_type == "Histórico de Leitura":
-                logs_df = db.get_reading_log()
-                if 'log_date' in logs_df.columns: logs_df['log_date'] = logs_df['log_date'].astype(str)
-                csv_data = logs_df.to_csv(index=False).encode('utf-8')
+                db.export_table_csv('reading_log', export_file)
                 file_name = "log_leitura_export.csv"
                 mime_type = "text/csv"
 
-            elif export_data_type == "Ambos":
-                st.warning("A exportação de ambos para CSV gerará arquivos separados. Exporte um de cada vez.")
-                # Não fornece botão de download direto para "Ambos" em CSV para evitar confusão.
-                csv_data = None
-            else:
-                 csv_data = None
+            else: # Ambos: um único ZIP com books.csv e reading_log.csv
+                db.export_bundle_zip(export_file)
+                file_name = "controle_leitura_taz_export.zip"
+                mime_type = "application/zip"
+
+            export_file.seek(0)
+            st.download_button(
+                label=f"📥 Baixar Arquivo CSV ({export_data_type})",
+                data=export_file,
+                file_name=file_name,
+                mime=mime_type
+            )
+            st.success("Dados CSV prontos para download!")
+
+        elif export_format == "Parquet (.parquet)":
+            # Colunar e comprimido, com inteiros e datas tipados (requer pyarrow)
+            export_file = tempfile.TemporaryFile()
+            if export_data_type == "Livros":
+                db.export_table_parquet('books', export_file)
+                file_name = "livros_export.parquet"
+                mime_type = "application/vnd.apache.parquet"
+
+            elif export_data_type == "Histórico de Leitura":
+                db.export_table_parquet('reading_log', export_file)
+                file_name = "log_leitura_export.parquet"
+                mime_type = "application/vnd.apache.parquet"
+
+            else: # Ambos: um único ZIP com books.parquet e reading_log.parquet
+                db.export_bundle_zip(export_file, file_format='parquet')
+                file_name = "controle_leitura_taz_export_parquet.zip"
+                mime_type = "application/zip"
 
-            if csv_data:
-                 st.download_button(
-                    label=f"📥 Baixar Arquivo CSV ({export_data_type})",
-                    data=csv_data,
-                    file_name=file_name,
-                    mime=mime_type
-                 )
-                 st.success("Dados CSV prontos para download!")
+            export_file.seek(0)
+            st.download_button(
+                label=f"📥 Baixar Arquivo Parquet ({export_data_type})",
+                data=export_file,
+                file_name=file_name,
+                mime=mime_type
+            )
+            st.success("Dados Parquet prontos para download!")
 
     except Exception as e:
         st.error(f"Erro durante a exportação: {e}")
@@ -78,99 +105,145 @@ if st.button("Exportar Dados"):
 
 st.markdown("---")
 
+profiling.checkpoint("exportar")
+
 # --- Importar Dados ---
-st.header("Importar Livros de CSV")
+st.header("Importar Livros de CSV ou Parquet")
 st.markdown("""
-            Faça upload de um arquivo CSV com as seguintes colunas (a ordem não importa, mas os nomes **DEVEM** ser exatos):
+            Faça upload de um arquivo CSV (ou Parquet) com as seguintes colunas (a ordem não importa, mas os nomes **DEVEM** ser exatos):
             `title`, `author`, `genre`, `total_pages`, `status`, `start_date` (formato YYYY-MM-DD, opcional), `end_date` (formato YYYY-MM-DD, opcional).
 
             O status deve ser um dos seguintes: `lendo`, `concluído`, `abandonado`, `desejado`.
             """)
 
-uploaded_file = st.file_uploader("Escolha um arquivo CSV", type="csv")
+uploaded_file = st.file_uploader("Escolha um arquivo CSV ou Parquet", type=["csv", "parquet"])
 
 if uploaded_file is not None:
+    import pandas as pd # Só com um arquivo enviado: a maioria das visitas não importa nada
     try:
-        # Tenta ler com diferentes delimitadores comuns
-        try:
-            import_df = pd.read_csv(uploaded_file, sep=',')
-        except Exception:
-             try:
-                 # Reposiciona o ponteiro do arquivo para o início
-                 uploaded_file.seek(0)
-                 import_df = pd.read_csv(uploaded_file, sep=';')
-             except Exception as e:
-                 st.error(f"Não foi possível ler o CSV. Verifique o formato e o delimitador (use ',' ou ';'). Erro: {e}")
-                 import_df = None # Garante que não prossiga
-
-        if import_df is not None:
+        is_parquet = uploaded_file.name.lower().endswith('.parquet')
+        if is_parquet:
+            # Prévia lendo só o primeiro lote, apenas com as colunas usadas na importação
+            preview_df = next(db.iter_parquet_chunks(uploaded_file, db.BOOK_IMPORT_COLUMNS, chunk_size=5),
+                              pd.DataFrame(columns=db.parquet_columns(uploaded_file)))
+            uploaded_file.seek(0)
+        else:
+            # Detecta o delimitador uma única vez e lê apenas as primeiras linhas para a prévia
+            sep = db.sniff_csv_delimiter(uploaded_file)
+            try:
+                preview_df = pd.read_csv(uploaded_file, sep=sep, nrows=5)
+            except Exception as e:
+                st.error(f"Não foi possível ler o CSV. Verifique o formato e o delimitador (use ',' ou ';'). Erro: {e}")
+                preview_df = None # Garante que não prossiga
+            finally:
+                uploaded_file.seek(0)
+
+        if preview_df is not None:
             st.write("Pré-visualização dos dados a importar:")
-            st.dataframe(import_df.head())
+            st.dataframe(preview_df)
 
             # Validação básica das colunas obrigatórias
             required_cols = {'title', 'author', 'total_pages', 'status'}
-            if not required_cols.issubset(import_df.columns):
-                missing_cols = required_cols - set(import_df.columns)
+            if not required_cols.issubset(preview_df.columns):
+                missing_cols = required_cols - set(preview_df.columns)
                 st.error(f"Colunas obrigatórias ausentes no CSV: {', '.join(missing_cols)}")
             else:
-                # Validação dos status
-                valid_status = ['lendo', 'concluído', 'abandonado', 'desejado']
-                invalid_status_rows = import_df[~import_df['status'].isin(valid_status)]
-                if not invalid_status_rows.empty:
-                    st.error(f"Status inválidos encontrados nas seguintes linhas (ver pré-visualização): {invalid_status_rows.index.tolist()}. Status válidos são: {', '.join(valid_status)}")
-
-                elif st.button("Confirmar Importação"):
+                # Último bloco confirmado deste arquivo, para retomar após uma falha
+                resume_key = f"import_books_next_chunk_{uploaded_file.name}_{uploaded_file.size}"
+                next_chunk = st.session_state.get(resume_key, 0)
+                if next_chunk > 0:
+                    st.info(f"A importação anterior deste arquivo parou após {next_chunk} bloco(s) de {db.IMPORT_CHUNK_SIZE} linhas. Ela continuará do bloco {next_chunk + 1}.")
+
+                # Validação (status, páginas, datas) e duplicatas são feitas em lote por db.bulk_add_books
+                if st.button("Confirmar Importação"):
                     imported_count = 0
                     skipped_count = 0
                     error_count = 0
-                    existing_books = db.get_all_books() # Para verificar duplicatas (simples, por título e autor)
-
-                    with st.spinner("Importando livros..."):
-                        for index, row in import_df.iterrows():
-                            # Checagem de duplicata simples
-                            is_duplicate = any(
-                                (existing_books['title'].str.lower() == str(row['title']).lower()) &
-                                (existing_books['author'].str.lower() == str(row['author']).lower())
-                            ) if not existing_books.empty else False
-
-                            if is_duplicate:
-                                skipped_count += 1
-                                continue # Pula duplicatas
-
-                            try:
-                                # Tratar datas opcionais - pd.to_datetime pode converter strings vazias ou NaNs para NaT
-                                start_date = pd.to_datetime(row.get('start_date'), errors='coerce').date() if 'start_date' in row and pd.notna(row['start_date']) else None
-                                end_date = pd.to_datetime(row.get('end_date'), errors='coerce').date() if 'end_date' in row and pd.notna(row['end_date']) else None
-
-                                # Garantir que total_pages seja int
-                                total_pages = int(row['total_pages']) if pd.notna(row['total_pages']) else 0
-                                if total_pages <= 0:
-                                     raise ValueError("Número total de páginas deve ser maior que 0.")
-
-                                # Adicionar ao banco
-                                db.add_book(
-                                    str(row['title']),
-                                    str(row['author']),
-                                    str(row.get('genre', '')), # Usa get para coluna opcional
-                                    total_pages,
-                                    str(row['status']),
-                                    start_date,
-                                    end_date
-                                )
-                                imported_count += 1
-                            except Exception as e:
-                                st.warning(f"Erro ao importar linha {index + 2} (Livro: {row.get('title', 'N/A')}): {e}. Pulando esta linha.")
-                                error_count += 1
-
-                    st.success(f"Importação concluída! {imported_count} livros importados.")
+                    error_reports = [] # Guarda no máximo MAX_ERROR_ROWS linhas para exibição
+                    MAX_ERROR_ROWS = 1000
+                    progress_bar = st.progress(0.0, text="Importando livros...")
+
+                    if is_parquet:
+                        chunks = db.iter_import_books_parquet(uploaded_file, start_chunk=next_chunk)
+                    else:
+                        chunks = db.iter_import_books_csv(uploaded_file, sep=sep, start_chunk=next_chunk)
+                    try:
+                        for chunk_index, result, bytes_read in chunks:
+                            st.session_state[resume_key] = chunk_index + 1
+                            imported_count += result['imported']
+                            skipped_count += result['skipped']
+                            error_count += len(result['errors'])
+                            if sum(len(r) for r in error_reports) < MAX_ERROR_ROWS:
+                                error_reports.append(result['errors'])
+                            progress_bar.progress(min(bytes_read / max(uploaded_file.size, 1), 1.0),
+                                                  text=f"Bloco {chunk_index + 1}: {imported_count} livros importados...")
+                    except Exception as e:
+                        st.error(f"Importação interrompida: {e}. Os blocos já confirmados foram mantidos; clique em 'Confirmar Importação' novamente para retomar.")
+                    else:
+                        st.session_state.pop(resume_key, None)
+                        progress_bar.progress(1.0, text="Importação concluída.")
+                        st.success(f"Importação concluída! {imported_count} livros importados.")
+
                     if skipped_count > 0:
                         st.info(f"{skipped_count} livros pulados (já existentes com mesmo título e autor).")
                     if error_count > 0:
-                        st.error(f"{error_count} linhas continham erros e não foram importadas.")
+                        st.error(f"{error_count} linhas continham erros e não foram importadas:")
+                        errors_df = pd.concat(error_reports).head(MAX_ERROR_ROWS)
+                        st.dataframe(errors_df.rename(columns={'row': 'Linha', 'title': 'Título', 'error': 'Erro'}), hide_index=True, use_container_width=True)
                     # Limpar o uploader após importação bem-sucedida
                     # uploaded_file = None # Não funciona diretamente assim no Streamlit
                     st.info("Atualize a página 'Gerenciar Livros' para ver os novos itens.") # Sugestão ao usuário
 
 
     except Exception as e:
-        st.error(f"Erro ao processar o arquivo CSV: {e}")
\ No newline at end of file
+        st.error(f"Erro ao processar o arquivo: {e}")
+
+
+st.markdown("---")
+
+profiling.checkpoint("importar livros")
+
+# --- Importar Histórico de Leitura ---
+st.header("Importar Histórico de Leitura")
+st.markdown("""
+            Faça upload de um arquivo CSV, Excel ou Parquet com as colunas:
+            `log_date` (formato YYYY-MM-DD), `pages_read`, `notes` (opcional) e a identificação do livro:
+            `book_id` **ou** `title` (ou `book_title`, como no export) com `author` opcional.
+
+            Os livros precisam estar cadastrados antes (importe-os acima). Títulos repetidos exigem a coluna `author`.
+            """)
+
+uploaded_log_file = st.file_uploader("Escolha um arquivo CSV, Excel ou Parquet", type=["csv", "xlsx", "parquet"], key="log_import_file")
+
+if uploaded_log_file is not None:
+    import pandas as pd
+    try:
+        if uploaded_log_file.name.lower().endswith('.xlsx'):
+            log_import_df = pd.read_excel(uploaded_log_file)
+        elif uploaded_log_file.name.lower().endswith('.parquet'):
+            # Projeção: lê só as colunas usadas pela importação, com datas já tipadas
+            log_import_df = db.read_parquet(uploaded_log_file, columns=['book_id', 'title', 'book_title', 'author', 'log_date', 'pages_read', 'notes'])
+        else:
+            log_import_df = pd.read_csv(uploaded_log_file, sep=db.sniff_csv_delimiter(uploaded_log_file))
+
+        st.write("Pré-visualização dos dados a importar:")
+        st.dataframe(log_import_df.head())
+
+        missing_cols = {'log_date', 'pages_read'} - set(log_import_df.columns)
+        if missing_cols:
+            st.error(f"Colunas obrigatórias ausentes: {', '.join(missing_cols)}")
+        elif not {'book_id', 'title', 'book_title'} & set(log_import_df.columns):
+            st.error("Informe a coluna `book_id` ou `title` para identificar os livros.")
+        elif st.button("Confirmar Importação do Histórico"):
+            with st.spinner("Importando registros de leitura..."):
+                result = db.bulk_add_log_entries(log_import_df)
+
+            st.success(f"Importação concluída! {result['imported']} registros de leitura importados.")
+            if not result['errors'].empty:
+                st.error(f"{len(result['errors'])} linhas continham erros e não foram importadas:")
+                st.dataframe(result['errors'].rename(columns={'row': 'Linha', 'title': 'Livro', 'error': 'Erro'}), hide_index=True, use_container_width=True)
+
+    except Exception as e:
+        st.error(f"Erro ao processar o arquivo de histórico: {e}")
+
+profiling.checkpoint("importar histórico")
@@ -0,0 +1,44 @@
+import streamlit as st
+import database as db
+import profiling
+import tenancy
+
+st.set_page_config(page_title="Buscar", page_icon="🔎")
+profiling.begin_run("Buscar")
+tenancy.select_tenant()
+st.title("🔎 Buscar Livros e Notas")
+
+# Busca pelo índice FTS5 (título, autor e gênero dos livros e notas dos registros de leitura)
+col_busca, col_limite = st.columns([4, 1])
+with col_busca:
+    termo_busca = st.text_input("Buscar por:", placeholder="Ex.: machado, ficção, capítulo final...", key="search_text")
+with col_limite:
+    limite = st.selectbox("Resultados:", options=[10, 20, 50, 100], index=1, key="search_limit")
+
+if not termo_busca.strip():
+    st.info("Digite um ou mais termos. Todos os termos precisam aparecer (também como início de palavra).")
+else:
+    livros_encontrados = db.search_books(termo_busca, limite)
+    notas_encontradas = db.search_notes(termo_busca, limite)
+
+    tab_livros, tab_notas = st.tabs([
+        f"📚 Livros ({len(livros_encontrados)})",
+        f"📝 Notas de Leitura ({len(notas_encontradas)})",
+    ])
+
+    with tab_livros:
+        if livros_encontrados.empty:
+            st.info("Nenhum livro encontrado.")
+        for livro in livros_encontrados.itertuples():
+            st.markdown(f"**{livro.title}** — {livro.author} · _{livro.status}_  \n{livro.snippet}")
+
+    with tab_notas:
+        if notas_encontradas.empty:
+            st.info("Nenhuma nota encontrada.")
+        for nota in notas_encontradas.itertuples():
+            st.markdown(
+                f"**{nota.book_title}** · {nota.log_date.strftime('%d/%m/%Y')} · {nota.pages_read} pág.  \n"
+                f"{nota.snippet}"
+            )
+
+profiling.checkpoint("busca")
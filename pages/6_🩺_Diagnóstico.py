@@ -0,0 +1,109 @@
+import streamlit as st
+import database as db
+import profiling
+import tenancy
+import pandas as pd
+
+st.set_page_config(page_title="Diagnóstico", page_icon="🩺", layout="wide")
+st.title("🩺 Diagnóstico de Desempenho")
+
+# --- Controle da Instrumentação ---
+col_toggle, col_reset = st.columns([3, 1])
+with col_toggle:
+    ativado = st.toggle("Registrar consultas e tempos das páginas", value=profiling.is_enabled(),
+                        help="Vale para todas as sessões deste servidor. Desligado por padrão (ou TAZ_PROFILE=1).")
+    if ativado != profiling.is_enabled():
+        profiling.enable(ativado)
+with col_reset:
+    if st.button("Limpar registros"):
+        profiling.reset()
+
+# Esta página também é registrada, depois do controle (para aparecer logo ao ativar)
+profiling.begin_run("Diagnóstico")
+tenancy.select_tenant()
+
+# --- Arquivo do Banco ---
+st.header("Banco de Dados")
+info = db.get_database_file_info()
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Banco", f"{info['db_bytes'] / 1024 ** 2:.1f} MB")
+col2.metric("WAL", f"{info['wal_bytes'] / 1024 ** 2:.1f} MB")
+col3.metric("Páginas livres", f"{info['freelist_count']:,}".replace(",", "."))
+col4.metric("Versão do esquema", info['schema_version'])
+st.caption(f"{info['path']} · {info['page_count']:,} páginas de {info['page_size']} bytes".replace(",", "."))
+
+consultas = pd.DataFrame(profiling.queries(), columns=['run', 'page', 'sql', 'params', 'seconds', 'rows', 'at'])
+secoes = pd.DataFrame(profiling.sections(), columns=['run', 'page', 'section', 'seconds', 'at'])
+
+if consultas.empty and secoes.empty:
+    st.info("Nenhum registro ainda. Ative a instrumentação acima e navegue pelas outras páginas.")
+    st.stop()
+
+# SQL com espaços normalizados, para agrupar as execuções da mesma consulta
+consultas['query'] = consultas['sql'].str.split().str.join(' ')
+consultas['ms'] = consultas['seconds'] * 1000
+
+# --- Consultas Mais Lentas ---
+st.header("Consultas")
+por_consulta = consultas.groupby('query').agg(
+    chamadas=('ms', 'size'), total_ms=('ms', 'sum'), media_ms=('ms', 'mean'),
+    max_ms=('ms', 'max'), linhas=('rows', 'mean'),
+).sort_values('total_ms', ascending=False).reset_index()
+st.subheader("Tempo total por consulta")
+st.dataframe(
+    por_consulta.rename(columns={'query': 'SQL', 'chamadas': 'Chamadas', 'total_ms': 'Total (ms)',
+                                 'media_ms': 'Média (ms)', 'max_ms': 'Máx. (ms)', 'linhas': 'Linhas (média)'})
+    .round({'Total (ms)': 1, 'Média (ms)': 2, 'Máx. (ms)': 2, 'Linhas (média)': 1}),
+    hide_index=True, use_container_width=True
+)
+
+st.subheader("Execuções mais lentas")
+mais_lentas = consultas.nlargest(20, 'ms')
+st.dataframe(
+    mais_lentas[['page', 'run', 'query', 'ms', 'rows']].rename(columns={
+        'page': 'Página', 'run': 'Execução', 'query': 'SQL', 'ms': 'Tempo (ms)', 'rows': 'Linhas'
+    }).round({'Tempo (ms)': 2}),
+    hide_index=True, use_container_width=True
+)
+
+# --- Por Execução da Página ---
+st.header("Por Execução (rerun)")
+por_execucao = consultas.groupby(['run', 'page'], dropna=False).agg(consultas=('ms', 'size'), sql_ms=('ms', 'sum'))
+tempo_secoes = secoes.groupby(['run', 'page'], dropna=False)['seconds'].sum().mul(1000).rename('secoes_ms')
+por_execucao = por_execucao.join(tempo_secoes, how='outer').fillna(0).sort_index(ascending=False).head(30).reset_index()
+st.dataframe(
+    por_execucao.rename(columns={'run': 'Execução', 'page': 'Página', 'consultas': 'Consultas',
+                                 'sql_ms': 'SQL (ms)', 'secoes_ms': 'Seções (ms)'})
+    .round({'SQL (ms)': 1, 'Seções (ms)': 1}),
+    hide_index=True, use_container_width=True
+)
+
+if not secoes.empty:
+    st.subheader("Tempo por seção")
+    por_secao = secoes.assign(ms=secoes['seconds'] * 1000).groupby(['page', 'section'], sort=False)['ms'] \
+        .agg(['size', 'mean', 'max']).reset_index()
+    st.dataframe(
+        por_secao.rename(columns={'page': 'Página', 'section': 'Seção', 'size': 'Execuções',
+                                  'mean': 'Média (ms)', 'max': 'Máx. (ms)'}).round({'Média (ms)': 1, 'Máx. (ms)': 1}),
+        hide_index=True, use_container_width=True
+    )
+
+# --- Plano de Execução ---
+st.header("Plano de Execução (EXPLAIN QUERY PLAN)")
+# Só SELECTs com os parâmetros da última execução registrada
+selects = consultas[consultas['query'].str.upper().str.startswith(('SELECT', 'WITH')) & consultas['params'].notna()]
+if selects.empty:
+    st.info("Nenhuma consulta SELECT registrada.")
+else:
+    ultima_execucao = selects.drop_duplicates('query', keep='last').set_index('query')
+    ordem = [q for q in por_consulta['query'] if q in ultima_execucao.index]
+    consulta_escolhida = st.selectbox("Consulta:", options=ordem, format_func=lambda q: q[:150])
+    registro = ultima_execucao.loc[consulta_escolhida]
+    st.code(registro['sql'], language='sql')
+    try:
+        plano = db.explain_query_plan(registro['sql'], registro['params'])
+        st.dataframe(plano[['id', 'parent', 'detail']], hide_index=True, use_container_width=True)
+    except Exception as e:
+        st.error(f"Não foi possível obter o plano: {e}")
+
+profiling.checkpoint("página")
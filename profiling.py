@@ -0,0 +1,89 @@
+"""Instrumentação opcional de consultas SQL e de trechos das páginas.
+
+Desligada por padrão (ou ligada com TAZ_PROFILE=1). Quando ligada, database.py registra
+cada consulta (SQL, parâmetros, tempo de execução + leitura e linhas) e as páginas
+registram o tempo de cada seção com checkpoint()/profile_section(). Os registros ficam
+em buffers circulares na memória do processo e são exibidos na página de Diagnóstico.
+"""
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+QUERY_LOG_SIZE = 5000
+SECTION_LOG_SIZE = 2000
+
+_enabled = os.environ.get("TAZ_PROFILE") == "1"
+_queries = deque(maxlen=QUERY_LOG_SIZE)
+_sections = deque(maxlen=SECTION_LOG_SIZE)
+_run_ids = itertools.count(1)
+
+# Execução (rerun) atual de cada thread: id, página e instante do último checkpoint
+_local = threading.local()
+
+def is_enabled():
+    return _enabled
+
+def enable(flag=True):
+    global _enabled
+    _enabled = bool(flag)
+
+def reset():
+    """Descarta todos os registros."""
+    _queries.clear()
+    _sections.clear()
+
+def begin_run(page):
+    """Marca o início de uma execução da página (chamar no topo do script)."""
+    if not _enabled:
+        return
+    _local.run = next(_run_ids)
+    _local.page = page
+    _local.last_checkpoint = time.perf_counter()
+
+def _current_run():
+    return getattr(_local, 'run', None), getattr(_local, 'page', None)
+
+def _record_section(section, seconds):
+    run, page = _current_run()
+    _sections.append({'run': run, 'page': page, 'section': section,
+                      'seconds': seconds, 'at': time.time()})
+
+def checkpoint(section):
+    """Registra o tempo desde o checkpoint anterior (ou begin_run) como a seção `section`."""
+    if not _enabled or getattr(_local, 'last_checkpoint', None) is None:
+        return
+    now = time.perf_counter()
+    _record_section(section, now - _local.last_checkpoint)
+    _local.last_checkpoint = now
+
+@contextmanager
+def profile_section(section):
+    """Registra o tempo do bloco como a seção `section`."""
+    if not _enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_section(section, time.perf_counter() - started)
+        _local.last_checkpoint = time.perf_counter()
+
+def record_query(sql, params, seconds, rows):
+    """Registra uma consulta; retorna o registro (o cursor soma a ele o tempo/linhas lidos depois)."""
+    run, page = _current_run()
+    record = {'run': run, 'page': page, 'sql': sql, 'params': params,
+              'seconds': seconds, 'rows': rows, 'at': time.time()}
+    _queries.append(record)
+    return record
+
+def queries():
+    """Cópia dos registros de consultas (mais antigos primeiro)."""
+    return list(_queries)
+
+def sections():
+    """Cópia dos registros de seções (mais antigos primeiro)."""
+    return list(_sections)
@@ -0,0 +1,251 @@
+"""Índice de recomendações da lista de desejos, em matrizes esparsas (scipy.sparse).
+
+Cada livro é uma linha (índice = id do livro) de uma matriz de atributos com três
+blocos, normalizada para que o produto entre duas linhas seja a similaridade do
+cosseno:
+
+- autor e gênero em one-hot: livros que compartilham autor/gênero coocorrem;
+- termos (TF-IDF) do título, autor e gênero e das notas de leitura do livro. As notas
+  costumam citar autores, temas e outros livros, e entram no mesmo vocabulário dos
+  títulos da lista de desejos.
+
+O histórico de leitura vira um peso por livro: concluídos e em leitura pesam pelo
+quanto foram lidos e pela recência da última leitura (meia-vida de HALF_LIFE_DAYS);
+abandonados pesam negativo. O perfil do leitor é a soma ponderada das linhas lidas e as
+sugestões são os desejados ordenados pela similaridade com esse perfil, calculada uma
+vez por versão dos dados (e por dia, pela recência), não a cada rerun.
+
+Atualização incremental pelo data_version: as notas novas (id > último id lido) são
+tokenizadas e somadas às contagens; os livros são relidos e só as linhas cujo texto
+mudou são recontadas. Se o total de registros não bate com o esperado (houve exclusão),
+as contagens de notas são refeitas. Editar só o texto de uma nota não é detectado até
+a próxima recontagem.
+"""
+import re
+import threading
+import unicodedata
+from datetime import date
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import database as db
+
+AUTHOR_WEIGHT = 1.0
+GENRE_WEIGHT = 0.5
+TERMS_WEIGHT = 0.8
+HALF_LIFE_DAYS = 365
+ABANDONED_WEIGHT = -0.5
+MIN_READING_WEIGHT = 0.25 # Livro em leitura recém-começado ainda conta
+
+# Letras, 3 ou mais; as palavras mais comuns do português não ajudam a comparar livros
+_TERM_RE = re.compile(r"[^\W\d_]{3,}")
+_COMBINING_RE = re.compile(r"[\u0300-\u036f]")
+STOPWORDS = frozenset("""
+    que para com uma não nao por mais como mas foi ele ela eles elas dos das seu sua seus suas
+    isso isto este esta esse essa aquele aquela muito muita tem ter ser são sao era eram nos nas
+    num numa pelo pela pelos pelas quando sobre entre até ate também tambem mesmo ainda bem sem
+    aos meu minha já depois antes onde qual quem porque pois cada todo toda todos todas outro
+    outra livro livros página páginas pagina paginas capítulo capitulo capítulos capitulos
+    the and for with
+""".split())
+
+def tokenize(text):
+    """Termos de um texto: minúsculos, sem acentos (como o índice de busca) e sem stopwords."""
+    text = _COMBINING_RE.sub('', unicodedata.normalize('NFKD', text.casefold()))
+    return [term for term in _TERM_RE.findall(text) if term not in STOPWORDS]
+
+def _normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return (sp.diags(1 / norms) @ matrix).tocsr()
+
+def _one_hot(rows, keys, n_rows):
+    """Matriz livro x valor distinto de `keys` (chaves vazias ficam sem coluna)."""
+    present = keys != ''
+    values, columns = np.unique(keys[present], return_inverse=True)
+    return sp.csr_matrix((np.ones(len(columns)), (rows[present], columns)), shape=(n_rows, len(values)))
+
+def _resize(matrix, shape):
+    matrix = matrix.tocsr(copy=True)
+    matrix.resize(shape)
+    return matrix
+
+class RecommendationIndex:
+    """Matrizes de um banco, atualizadas incrementalmente pelo data_version."""
+
+    def __init__(self):
+        self.vocabulary = {}
+        self.book_text = np.empty(0, dtype=object) # Texto (título, autor, gênero) por linha
+        self.book_terms = sp.csr_matrix((0, 0))    # Contagens de termos dos livros
+        self.note_terms = sp.csr_matrix((0, 0))    # Contagens de termos das notas
+        self.last_log_id = 0
+        self.log_total = 0
+        self.data_version = None
+        self.day = None
+        self.full_recounts = 0
+        # (livros por id, atributos, pesos do histórico, ids ordenados, similaridades), trocados juntos
+        self.index = None
+
+    # --- Contagens ---
+
+    def _count_terms(self, rows, texts, n_rows):
+        term_rows, term_columns = [], []
+        vocabulary = self.vocabulary
+        for row, text in zip(rows, texts):
+            for term in tokenize(text):
+                column = vocabulary.get(term)
+                if column is None:
+                    column = vocabulary[term] = len(vocabulary)
+                term_rows.append(row)
+                term_columns.append(column)
+        n_rows = max(n_rows, max(term_rows, default=-1) + 1)
+        return sp.csr_matrix((np.ones(len(term_rows), dtype=np.float64), (term_rows, term_columns)),
+                             shape=(n_rows, len(vocabulary)))
+
+    def _update_books(self, books):
+        """Reconta os termos só das linhas cujo título/autor/gênero mudou (ou que sumiram)."""
+        ids = books['id'].to_numpy(dtype=np.int64)
+        n_rows = max(int(ids.max()) + 1 if len(ids) else 0, len(self.book_text))
+        text = np.full(n_rows, '', dtype=object)
+        text[ids] = (books['title'].fillna('') + ' ' + books['author'].fillna('') + ' '
+                     + books['genre'].fillna('')).to_numpy()
+        previous = np.full(n_rows, '', dtype=object)
+        previous[:len(self.book_text)] = self.book_text
+        changed = np.flatnonzero(text != previous)
+        if len(changed) == 0:
+            return
+        new_terms = self._count_terms(changed, text[changed], n_rows)
+        keep = np.ones(n_rows)
+        keep[changed] = 0
+        book_terms = sp.diags(keep) @ _resize(self.book_terms, (n_rows, len(self.vocabulary)))
+        self.book_terms = (book_terms + new_terms).tocsr()
+        self.book_terms.eliminate_zeros()
+        self.book_text = text
+
+    def _update_notes(self, n_rows):
+        """Soma as notas novas; refaz tudo se algum registro foi apagado desde a última vez."""
+        new_count, max_id = db.count_log_entries_after(self.last_log_id)
+        total = db.count_reading_log()
+        if total != self.log_total + new_count:
+            self.note_terms = sp.csr_matrix((0, 0))
+            self.last_log_id = 0
+            self.full_recounts += 1
+            new_count, max_id = db.count_log_entries_after(0)
+        if new_count:
+            for rows in db.iter_log_notes(after_id=self.last_log_id, up_to_id=max_id):
+                book_ids, notes = zip(*rows)
+                new_terms = self._count_terms(book_ids, notes, n_rows)
+                shape = (max(new_terms.shape[0], self.note_terms.shape[0]), len(self.vocabulary))
+                self.note_terms = _resize(self.note_terms, shape) + _resize(new_terms, shape)
+        self.last_log_id = max_id
+        self.log_total = total
+
+    # --- Índice ---
+
+    def _features(self, books):
+        """Atributos por livro (linhas normalizadas): autor, gênero e termos TF-IDF."""
+        n_rows = max(self.book_terms.shape[0], self.note_terms.shape[0])
+        shape = (n_rows, len(self.vocabulary))
+        counts = _resize(self.book_terms, shape) + _resize(self.note_terms, shape)
+        documents = max(np.count_nonzero(counts.getnnz(axis=1)), 1)
+        idf = np.log((1 + documents) / (1 + np.bincount(counts.indices, minlength=shape[1]))) + 1
+        counts.data = np.log1p(counts.data)
+        terms = _normalize_rows(counts @ sp.diags(idf))
+
+        ids = books['id'].to_numpy(dtype=np.int64)
+        authors = _one_hot(ids, books['author'].fillna('').str.strip().str.casefold().to_numpy(), n_rows)
+        genres = _one_hot(ids, books['genre'].fillna('').str.strip().str.casefold().to_numpy(), n_rows)
+        return _normalize_rows(sp.hstack([AUTHOR_WEIGHT * authors, GENRE_WEIGHT * genres,
+                                          TERMS_WEIGHT * terms]).tocsr())
+
+    def _history(self, books, n_rows, today):
+        """Peso de cada livro no perfil: quanto foi lido x recência; abandonados negativos."""
+        status = books['status'].to_numpy()
+        total_pages = books['total_pages'].to_numpy(dtype=np.float64)
+        progress = np.clip(np.divide(books['pages_read_total'].to_numpy(dtype=np.float64), total_pages,
+                                     out=np.zeros(len(books)), where=total_pages > 0), 0, 1)
+        engagement = np.select([status == 'concluído', status == 'lendo', status == 'abandonado'],
+                               [1.0, np.maximum(progress, MIN_READING_WEIGHT), ABANDONED_WEIGHT], 0.0)
+        # Última atividade: conclusão ou último registro (dias desde 1970-01-01)
+        last_day = np.fmax(books['end_date'].to_numpy(dtype=np.float64),
+                           books['last_log_date'].to_numpy(dtype=np.float64))
+        age = np.clip(db.to_day_number(today) - last_day, 0, None)
+        recency = np.where(np.isnan(last_day), 0.5, 0.5 ** (age / HALF_LIFE_DAYS))
+        history = np.zeros(n_rows)
+        history[books['id'].to_numpy(dtype=np.int64)] = engagement * recency
+        return history
+
+    def _rank(self, books, features, today):
+        history = self._history(books, features.shape[0], today)
+        read = np.flatnonzero(history)
+        profile = features[read].T @ history[read]
+        profile /= max(np.linalg.norm(profile), 1e-12) # score = cosseno com o perfil
+        wishlist = books.loc[books['status'] == 'desejado', 'id'].to_numpy(dtype=np.int64)
+        scores = features[wishlist] @ profile
+        # Mais similar primeiro; empate (ex.: sem histórico) pelos adicionados mais recentemente
+        order = np.lexsort((-wishlist, -scores))
+        self.index = (books.set_index('id'), features, history, wishlist[order], scores[order])
+
+    def refresh(self):
+        """Aplica as escritas feitas desde a última atualização (e a passagem do dia)."""
+        version, today = db.get_data_version(), date.today()
+        if version == self.data_version and today == self.day:
+            return
+        if version != self.data_version:
+            books = db.fetch_recommendation_books()
+            self._update_books(books)
+            self._update_notes(len(self.book_text))
+            features = self._features(books)
+        else:
+            books, features = self.index[0].reset_index(), self.index[1]
+        self._rank(books, features, today)
+        self.data_version, self.day = version, today
+
+    # --- Consultas ---
+
+    def top_k(self, k=5):
+        """As k melhores sugestões da lista de desejos.
+
+        Colunas: book_id, title, author, genre, score e because (título do livro lido que
+        mais contribuiu para a sugestão, ou None).
+        """
+        books, features, history, ranked_ids, ranked_scores = self.index
+        top, scores = ranked_ids[:k], ranked_scores[:k]
+        because = [None] * len(top)
+        read = np.flatnonzero(history > 0)
+        if len(top) and len(read):
+            contributions = (features[top] @ features[read].T).toarray() * history[read]
+            best = contributions.argmax(axis=1)
+            titles = books['title'].reindex(read[best]).to_numpy()
+            because = [title if contributions[i, j] > 0 else None for i, (j, title) in enumerate(zip(best, titles))]
+        suggestions = books.loc[top, ['title', 'author', 'genre']].reset_index()
+        suggestions = suggestions.rename(columns={'id': 'book_id'})
+        suggestions['score'] = scores
+        suggestions['because'] = because
+        return suggestions
+
+    def similar_books(self, book_id, k=5):
+        """Os k livros do acervo mais similares a `book_id`: book_id, title, author, status, score."""
+        books, features = self.index[0], self.index[1]
+        if book_id not in books.index:
+            return pd.DataFrame(columns=['book_id', 'title', 'author', 'status', 'score'])
+        similarity = (features @ features[book_id].T).toarray().ravel()
+        similarity[book_id] = 0
+        candidates = np.flatnonzero(similarity > 0)
+        best = candidates[np.argsort(-similarity[candidates], kind='stable')[:k]]
+        similar = books.loc[best, ['title', 'author', 'status']].reset_index()
+        similar = similar.rename(columns={'id': 'book_id'})
+        similar['score'] = similarity[best]
+        return similar
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_recommendation_index():
+    """RecommendationIndex do banco atual, atualizado com as escritas mais recentes."""
+    with _indexes_lock:
+        index = _indexes.get(db.get_db_name())
+        if index is None:
+            index = _indexes[db.get_db_name()] = RecommendationIndex()
+        index.refresh()
+        return index
@@ -0,0 +1,87 @@
+"""Estatísticas derivadas compartilhadas pelo dashboard (app.py) e pela página de metas.
+
+Todas as métricas de um intervalo de anos saem de uma única chamada a compute_stats,
+que parte da cópia colunar do log em memória (logstore.py) e de poucas consultas
+agregadas no SQLite, e é memorizada por (anos, mês atual, versão dos dados) pelo cache
+de database.py, então todas as páginas reaproveitam o mesmo resultado enquanto nada for
+escrito e o mês não virar.
+"""
+import pandas as pd
+from datetime import datetime
+import database as db
+import logstore
+
+MONTH_NAMES = {1: 'Jan', 2: 'Fev', 3: 'Mar', 4: 'Abr', 5: 'Mai', 6: 'Jun',
+               7: 'Jul', 8: 'Ago', 9: 'Set', 10: 'Out', 11: 'Nov', 12: 'Dez'}
+
+def available_years():
+    """Anos com dados (do primeiro ao ano atual); só o ano atual se o banco estiver vazio."""
+    current_year = datetime.now().year
+    bounds = db.get_year_bounds()
+    if bounds is None:
+        return [current_year]
+    return list(range(min(bounds[0], current_year), max(bounds[1], current_year) + 1))
+
+def compute_stats(start_year=None, end_year=None):
+    """Calcula todas as métricas derivadas dos anos start_year..end_year (padrão: ano atual).
+
+    Retorna um dict com:
+    - per_year: DataFrame indexado por ano (books_finished, pages_read, log_count,
+      reading_days, avg_pages_per_day)
+    - totals: as mesmas métricas somadas no intervalo
+    - pages_per_month: year, month, month_name, pages_read (meses futuros omitidos)
+    - pages_per_weekday: weekday (0 = segunda), weekday_name, pages_read, reading_days
+    - genres: Series com livros concluídos por gênero, em ordem decrescente
+    - books_by_status: quantidade atual de livros por status
+    """
+    # A data atual é resolvida antes do cache e entra na chave: a grade de meses vai até
+    # o mês atual, então a virada do mês recalcula mesmo sem escritas
+    now = datetime.now()
+    if start_year is None:
+        start_year = now.year
+    return _compute_stats(start_year, start_year if end_year is None else end_year, now.year, now.month)
+
+@db.cached_read
+def _compute_stats(start_year, end_year, current_year, current_month):
+    start_date, end_date = db.year_range(start_year)[0], db.year_range(end_year)[1]
+
+    store = logstore.get_log_store()
+    monthly = store.pages_by_month(start_date, end_date)
+    daily = store.daily_breakdown(start_date, end_date)
+    finished = db.get_finished_books_by_year(start_date, end_date)
+
+    # Métricas por ano
+    years = pd.Index(range(start_year, end_year + 1), name='year')
+    per_year = pd.DataFrame(index=years)
+    per_year['books_finished'] = finished.groupby('year')['count'].sum().reindex(years, fill_value=0)
+    daily_per_year = daily.groupby('year')[['pages_read', 'log_count', 'reading_days']].sum().reindex(years, fill_value=0)
+    per_year = per_year.join(daily_per_year).astype('int64')
+    per_year['avg_pages_per_day'] = (per_year['pages_read'] / per_year['reading_days'].where(per_year['reading_days'] > 0)).fillna(0.0)
+
+    totals = per_year[['books_finished', 'pages_read', 'log_count', 'reading_days']].sum().astype('int64').to_dict()
+    totals['avg_pages_per_day'] = totals['pages_read'] / totals['reading_days'] if totals['reading_days'] > 0 else 0
+
+    # Páginas por mês: todos os meses do intervalo, até o mês atual
+    grid = pd.MultiIndex.from_product([years, range(1, 13)], names=['year', 'month']).to_frame(index=False)
+    grid = grid[(grid['year'] < current_year) | ((grid['year'] == current_year) & (grid['month'] <= current_month))]
+    pages_per_month = grid.merge(monthly[['year', 'month', 'pages_read']], on=['year', 'month'], how='left')
+    pages_per_month['pages_read'] = pages_per_month['pages_read'].fillna(0).astype('int64')
+    pages_per_month['month_name'] = pages_per_month['month'].map(MONTH_NAMES)
+
+    # Páginas por dia da semana no intervalo
+    pages_per_weekday = daily.groupby('weekday')[['pages_read', 'reading_days']].sum().reindex(range(7), fill_value=0)
+    pages_per_weekday = pages_per_weekday.rename_axis('weekday').reset_index()
+    pages_per_weekday['weekday_name'] = [db.WEEKDAY_NAMES[d] for d in pages_per_weekday['weekday']]
+
+    genres = finished.groupby('genre')['count'].sum().sort_values(ascending=False)
+
+    return {
+        'start_year': start_year,
+        'end_year': end_year,
+        'per_year': per_year,
+        'totals': totals,
+        'pages_per_month': pages_per_month,
+        'pages_per_weekday': pages_per_weekday,
+        'genres': genres,
+        'books_by_status': db.count_books_by_status(),
+    }
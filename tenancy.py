@@ -0,0 +1,32 @@
+"""Escolha do leitor (shard) da sessão do Streamlit.
+
+Cada página chama select_tenant() logo após o set_page_config, antes de qualquer acesso
+ao banco. Sem TAZ_MULTI_TENANT=1 não faz nada e todas as páginas usam DB_NAME.
+"""
+import streamlit as st
+import database as db
+
+def select_tenant():
+    """Direciona o database.py desta execução para o shard do leitor escolhido na barra lateral.
+
+    O leitor fica em st.session_state.tenant_id (vale para todas as páginas da sessão) e
+    pode vir de ?leitor=... na URL. Interrompe a página enquanto nenhum leitor for informado.
+    """
+    if not db.TENANT_MODE:
+        return None
+
+    if 'tenant_id' not in st.session_state:
+        st.session_state.tenant_id = st.query_params.get('leitor', '')
+    leitor = st.sidebar.text_input("Leitor(a):", value=st.session_state.tenant_id,
+                                   help="Cada leitor(a) tem seus próprios livros e registros.")
+    try:
+        db.set_tenant(leitor or None)
+    except ValueError as e:
+        st.sidebar.error(str(e))
+        st.stop()
+    st.session_state.tenant_id = db.get_tenant() or ''
+
+    if not leitor:
+        st.info("Informe o(a) leitor(a) na barra lateral para continuar.")
+        st.stop()
+    return db.get_tenant()
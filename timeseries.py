@@ -0,0 +1,77 @@
+"""Séries temporais para gráficos com tamanho de payload constante.
+
+A série é agregada no SQLite na resolução pedida (dia, semana ou mês) e, se ainda tiver
+mais pontos que o orçamento, reduzida com LTTB (Largest-Triangle-Three-Buckets), que
+preserva picos e mudanças de inclinação. Assim o gráfico envia no máximo max_points
+pontos ao navegador, qualquer que seja o tamanho do histórico ou do intervalo.
+"""
+import numpy as np
+import database as db
+
+MAX_CHART_POINTS = 500
+
+RESOLUTIONS = ['day', 'week', 'month']
+
+def lttb(x, y, n_out):
+    """Índices dos pontos escolhidos pelo LTTB para reduzir (x, y) a n_out pontos.
+
+    x deve ser crescente. Mantém sempre o primeiro e o último ponto.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        raise ValueError("O LTTB precisa de pelo menos 3 pontos de saída")
+
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    # Pontos internos divididos em n_out - 2 faixas de tamanho (quase) igual
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Média da próxima faixa (ou o último ponto, na última faixa)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        # Ponto da faixa que forma o maior triângulo com o ponto anterior escolhido e a média
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+def choose_resolution(start_date, end_date, max_points=MAX_CHART_POINTS):
+    """Resolução mais fina cujo número de períodos no intervalo cabe em max_points."""
+    days = (end_date - start_date).days + 1
+    if days <= max_points:
+        return 'day'
+    if days / 7 <= max_points:
+        return 'week'
+    return 'month'
+
+def cumulative_pages(start_date=None, end_date=None, resolution='auto', max_points=MAX_CHART_POINTS):
+    """Páginas acumuladas no intervalo, com no máximo max_points pontos.
+
+    resolution: 'day', 'week', 'month' ou 'auto' (escolhe pelo tamanho do intervalo).
+    Retorna (DataFrame com period, pages_read e cumulative_pages, resolução usada);
+    o DataFrame fica vazio se não houver leituras.
+    """
+    bounds = db.get_reading_date_bounds()
+    if bounds is None:
+        return db.get_reading_timeseries('day'), 'day'
+    start_date = max(start_date or bounds[0], bounds[0])
+    end_date = min(end_date or bounds[1], bounds[1])
+
+    if resolution == 'auto':
+        resolution = choose_resolution(start_date, end_date, max_points)
+    series = db.get_reading_timeseries(resolution, start_date, end_date)
+
+    if len(series) > max_points:
+        x = series['period'].to_numpy(dtype='datetime64[D]').astype('int64')
+        series = series.iloc[lttb(x, series['cumulative_pages'].to_numpy(), max_points)].reset_index(drop=True)
+    return series, resolution